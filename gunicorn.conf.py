@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the Flask API (src/api.py)
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+"""
+import os
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+wsgi_app = "api:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# gevent greenlets keep a worker responsive while requests wait on I/O.
+# One worker by default: the retriever's keyword index, the vector index
+# and the query caches live in the process, so a second worker would not
+# see the first one's ingests and would overwrite its index files
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+worker_connections = 1000
+timeout = 120
+
+# api.py opens the Chroma SQLite store at import time; SQLite connections
+# must not be shared across fork, so each worker imports the app itself
+preload_app = False
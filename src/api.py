@@ -1,26 +1,86 @@
 """
 REST API for Advanced RAG System
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from flask_cors import CORS
 from rag_system import AdvancedRAGSystem
+from semantic_cache import SemanticQueryCache
+from collections import deque
+from typing import Optional
+import ijson
+import orjson
 import os
+import shutil
+import sys
+import tempfile
+import threading
 import time
 
 app = Flask(__name__)
 CORS(app)
 
+
+def json_response(payload, status: int = 200) -> Response:
+    """Serialize a payload with orjson (C-level, handles NumPy scalars)"""
+    return Response(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+
+def _validate_documents(body) -> Optional[str]:
+    """
+    Check an ingest body without building its documents
+
+    Walks the ijson event stream, so memory stays flat however large the
+    body is. Returns an error message, or None if the body is valid.
+    """
+    has_documents = False
+    keys = None
+    for prefix, event, value in ijson.parse(body):
+        if prefix == '' and event == 'map_key' and value == 'documents':
+            has_documents = True
+        elif prefix == 'documents' and event not in ('start_array', 'end_array'):
+            return 'documents must be a list'
+        elif prefix == 'documents.item':
+            if event == 'start_map':
+                keys = set()
+            elif event == 'map_key':
+                keys.add(value)
+            elif event == 'end_map':
+                if 'id' not in keys or 'text' not in keys:
+                    return 'Each document must have id and text'
+            else:
+                return 'Each document must have id and text'
+
+    if not has_documents:
+        return 'Missing documents field'
+    return None
+
+
 # Initialize RAG system
 rag_system = AdvancedRAGSystem()
 
-# In-memory store for tracking
-request_log = []
+# Documents are handed to the RAG system in batches of this size
+INGEST_BATCH_SIZE = 32
+
+# Ingest bodies up to this size are validated in memory, larger ones on disk
+INGEST_SPOOL_BYTES = 8 << 20
+
+# Near-duplicate queries reuse earlier results until the next ingest
+query_cache = SemanticQueryCache(threshold=0.95, ttl_seconds=300)
+
+# In-memory store for tracking (bounded, oldest entries are dropped)
+request_log = deque(maxlen=1024)
+request_log_lock = threading.Lock()
+total_requests = 0
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
+    return json_response({
         'status': 'healthy',
         'timestamp': time.time()
     })
@@ -38,33 +98,57 @@ def ingest_documents():
             {"id": "doc2", "text": "..."}
         ]
     }
+
+    The body is spooled and validated in full first, so a malformed
+    document rejects the request before anything is ingested. It is then
+    parsed incrementally and documents are ingested in batches of
+    INGEST_BATCH_SIZE, so peak memory does not grow with request size.
+    The keyword index is rebuilt and saved once, after the last batch.
     """
+    start_time = time.time()
+    num_documents = 0
+    num_chunks = 0
+
     try:
-        data = request.get_json()
+        with tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_BYTES) as body:
+            shutil.copyfileobj(request.stream, body)
 
-        if 'documents' not in data:
-            return jsonify({'error': 'Missing documents field'}), 400
+            body.seek(0)
+            error = _validate_documents(body)
+            if error:
+                return json_response({'error': error}, 400)
 
-        documents = data['documents']
+            body.seek(0)
+            batch = []
 
-        # Validate documents
-        for doc in documents:
-            if 'id' not in doc or 'text' not in doc:
-                return jsonify({'error': 'Each document must have id and text'}), 400
+            for doc in ijson.items(body, 'documents.item'):
+                batch.append(doc)
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    num_chunks += rag_system.ingest_documents(batch, flush=False)
+                    num_documents += len(batch)
+                    batch = []
 
-        start_time = time.time()
-        num_chunks = rag_system.ingest_documents(documents)
-        ingest_time = time.time() - start_time
+            if batch:
+                num_chunks += rag_system.ingest_documents(batch, flush=False)
+                num_documents += len(batch)
 
-        return jsonify({
+        return json_response({
             'success': True,
-            'num_documents': len(documents),
+            'num_documents': num_documents,
             'num_chunks_created': num_chunks,
-            'ingest_time_seconds': ingest_time
+            'ingest_time_seconds': time.time() - start_time
         })
 
+    except ijson.JSONError as e:
+        return json_response({'error': f'Invalid JSON body: {str(e)}'}, 400)
+
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
+
+    finally:
+        if num_documents:
+            rag_system.flush()
+            query_cache.clear()
 
 
 @app.route('/query', methods=['POST'])
@@ -83,31 +167,45 @@ def query():
         data = request.get_json()
 
         if 'query' not in data:
-            return jsonify({'error': 'Missing query field'}), 400
+            return json_response({'error': 'Missing query field'}, 400)
 
         query_text = data['query']
         top_k = data.get('top_k', 5)
         return_metrics = data.get('return_metrics', True)
 
-        # Execute query
-        result = rag_system.query(
-            query_text,
-            top_k=top_k,
-            return_metrics=return_metrics
-        )
+        # Serve near-duplicate queries from the semantic cache
+        query_embedding = rag_system.retriever.embed_query(query_text)
+        cache_params = (top_k, return_metrics)
+        result = query_cache.get(query_embedding, cache_params)
+
+        if result is not None:
+            # The cached answer may be for a paraphrase; report this question
+            result = dict(result, query=query_text, cache='hit')
+        else:
+            # Execute query
+            result = rag_system.query(
+                query_text,
+                top_k=top_k,
+                return_metrics=return_metrics
+            )
+            query_cache.put(query_embedding, cache_params, result)
+            result = dict(result, cache='miss')
 
         # Log request
-        request_log.append({
-            'timestamp': time.time(),
-            'query': query_text,
-            'top_k': top_k,
-            'num_results': result['num_results']
-        })
+        global total_requests
+        with request_log_lock:
+            request_log.append({
+                'timestamp': time.time(),
+                'query': query_text,
+                'top_k': top_k,
+                'num_results': result['num_results']
+            })
+            total_requests += 1
 
-        return jsonify(result)
+        return json_response(result)
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 
 @app.route('/metrics', methods=['GET'])
@@ -116,20 +214,24 @@ def get_metrics():
     try:
         metrics_summary = rag_system.get_metrics_summary()
 
-        return jsonify({
+        with request_log_lock:
+            recent_queries = list(request_log)[-10:]  # Last 10 queries
+            request_count = total_requests
+
+        return json_response({
             'system_metrics': metrics_summary,
-            'total_requests': len(request_log),
-            'recent_queries': request_log[-10:]  # Last 10 queries
+            'total_requests': request_count,
+            'recent_queries': recent_queries
         })
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 
 @app.route('/chunking-info', methods=['GET'])
 def chunking_info():
     """Get information about the chunking strategy"""
-    return jsonify({
+    return json_response({
         'strategy': 'Semantic Chunking with Adaptive Sizing',
         'parameters': {
             'target_chunk_size': rag_system.chunker.target_chunk_size,
@@ -145,6 +247,19 @@ def chunking_info():
     })
 
 
+@app.route('/index-info', methods=['GET'])
+def index_info():
+    """Get information about the vector index"""
+    try:
+        return json_response(rag_system.get_index_info())
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    from gunicorn.app.wsgiapp import run
+
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gunicorn.conf.py')
+    sys.argv = ['gunicorn', '-c', config_path]
+    sys.exit(run())
@@ -0,0 +1,207 @@
+"""
+Chunk Store Module
+Append-only on-disk storage of chunk texts and metadata, read lazily by chunk id
+"""
+from typing import Dict, List, Optional
+import numpy as np
+import logging
+import mmap
+import os
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore:
+    """
+    Chunk texts and metadata keyed by int64 chunk id
+
+    Texts (UTF-8) and metadata (orjson) are appended to two blob files.
+    Per-chunk ids, byte offsets and a live flag are kept in small .npy
+    arrays. Loading memory-maps the arrays and the blobs, so start-up cost
+    does not grow with the amount of text; a chunk is only decoded when it
+    is looked up. Chunks added since the last flush() are held in memory.
+
+    Chunk ids must be added in increasing order. Removed chunks are only
+    flagged; their bytes stay in the blobs.
+    """
+
+    _ARRAYS = ('ids', 'text_offsets', 'metadata_offsets', 'live')
+
+    def __init__(self, directory: str):
+        """
+        Initialize chunk store
+
+        Args:
+            directory: Directory holding the blob and array files
+        """
+        self.directory = directory
+        self._texts_path = os.path.join(directory, "chunk_texts.bin")
+        self._metadata_path = os.path.join(directory, "chunk_metadata.bin")
+
+        # Chunks added since the last flush, as parallel text and metadata
+        # columns like the blobs they are flushed to
+        self._pending_rows: Dict[int, int] = {}  # chunk id -> column position
+        self._pending_texts: List[str] = []
+        self._pending_metadata: List[Dict] = []
+        self._dirty = False
+
+        # Persisted rows as (ids, text_offsets, metadata_offsets, live),
+        # swapped as one tuple so readers never mix arrays of two flushes
+        self._rows = (
+            np.empty(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.empty(0, dtype=bool)
+        )
+        self._texts = b''
+        self._metadata = b''
+        self._live_count = 0
+
+    def _array_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"chunk_{name}.npy")
+
+    def load(self) -> bool:
+        """Memory-map the persisted chunks, returning whether any were found"""
+        try:
+            arrays = [
+                np.load(self._array_path(name), mmap_mode='r', allow_pickle=False)
+                for name in self._ARRAYS
+            ]
+            texts = self._map(self._texts_path)
+            metadata = self._map(self._metadata_path)
+        except FileNotFoundError:
+            return False
+
+        ids, text_offsets, metadata_offsets, live = arrays
+        if (len(text_offsets) != len(ids) + 1 or len(metadata_offsets) != len(ids) + 1
+                or len(live) != len(ids) or text_offsets[-1] > len(texts)
+                or metadata_offsets[-1] > len(metadata)):
+            logger.warning(f"Ignoring inconsistent chunk store in {self.directory}")
+            return False
+
+        # Blobs before arrays: rows are only ever appended, so a reader that
+        # sees the old arrays still finds its bytes in the new blobs
+        self._texts = texts
+        self._metadata = metadata
+        self._rows = (ids, text_offsets, metadata_offsets, live)
+        self._live_count = int(np.count_nonzero(live))
+        return True
+
+    @staticmethod
+    def _map(path: str):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def add(self, chunk_ids: List[int], chunks: List[Dict]):
+        """Add chunks (dicts with 'text' and 'metadata') under increasing ids"""
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            self._pending_rows[chunk_id] = len(self._pending_texts)
+            self._pending_texts.append(chunk['text'])
+            self._pending_metadata.append(chunk['metadata'])
+        self._dirty = True
+
+    def get(self, chunk_id: int) -> Optional[Dict]:
+        """The chunk stored under chunk_id, or None if there is none"""
+        return self.get_many(np.array([chunk_id], dtype=np.int64))[0]
+
+    def get_many(self, chunk_ids: np.ndarray) -> List[Optional[Dict]]:
+        """
+        The chunks stored under chunk_ids, None where there is none
+
+        Persisted rows of all ids are located with one searchsorted; only
+        the found rows are decoded.
+        """
+        ids, text_offsets, metadata_offsets, live = self._rows
+        texts, metadata = self._texts, self._metadata
+
+        rows = np.searchsorted(ids, chunk_ids)
+        found = rows < len(ids)
+        found[found] &= ids[rows[found]] == chunk_ids[found]
+        found[found] &= live[rows[found]]
+
+        chunks = []
+        for chunk_id, row, is_found in zip(chunk_ids.tolist(), rows.tolist(), found.tolist()):
+            if is_found:
+                chunks.append({
+                    'text': texts[text_offsets[row]:text_offsets[row + 1]].decode(),
+                    'metadata': orjson.loads(metadata[metadata_offsets[row]:metadata_offsets[row + 1]])
+                })
+            else:
+                position = self._pending_rows.get(chunk_id)
+                chunks.append(None if position is None else {
+                    'text': self._pending_texts[position],
+                    'metadata': self._pending_metadata[position]
+                })
+        return chunks
+
+    def remove(self, chunk_ids: List[int]):
+        """Remove chunks; unknown ids are ignored"""
+        ids, text_offsets, metadata_offsets, live = self._rows
+        for chunk_id in chunk_ids:
+            if self._pending_rows.pop(chunk_id, None) is not None:
+                continue  # Its column entries are skipped by flush
+            row = int(np.searchsorted(ids, chunk_id))
+            if row < len(ids) and ids[row] == chunk_id and live[row]:
+                if not live.flags.writeable:
+                    live = np.array(live)
+                    self._rows = (ids, text_offsets, metadata_offsets, live)
+                live[row] = False
+                self._live_count -= 1
+                self._dirty = True
+
+    def flush(self):
+        """Append pending chunks to the blobs and rewrite the row arrays"""
+        if not self._dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        ids, text_offsets, metadata_offsets, live = self._rows
+        if self._pending_rows:
+            new_ids = np.fromiter(self._pending_rows, dtype=np.int64, count=len(self._pending_rows))
+            positions = list(self._pending_rows.values())
+            texts = [self._pending_texts[p].encode() for p in positions]
+            metadata = [orjson.dumps(self._pending_metadata[p]) for p in positions]
+
+            self._append(self._texts_path, int(text_offsets[-1]), texts)
+            self._append(self._metadata_path, int(metadata_offsets[-1]), metadata)
+
+            text_lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+            metadata_lengths = np.fromiter(map(len, metadata), dtype=np.int64, count=len(metadata))
+            ids = np.concatenate([ids, new_ids])
+            text_offsets = np.concatenate([text_offsets, text_offsets[-1] + np.cumsum(text_lengths)])
+            metadata_offsets = np.concatenate(
+                [metadata_offsets, metadata_offsets[-1] + np.cumsum(metadata_lengths)]
+            )
+            live = np.concatenate([live, np.ones(len(new_ids), dtype=bool)])
+
+        arrays = dict(zip(self._ARRAYS, (ids, text_offsets, metadata_offsets, live)))
+        for name in self._ARRAYS:
+            path = self._array_path(name)
+            with open(f'{path}.tmp', 'wb') as f:
+                np.save(f, arrays[name], allow_pickle=False)
+            os.replace(f'{path}.tmp', path)
+
+        self.load()
+        self._pending_rows = {}
+        self._pending_texts = []
+        self._pending_metadata = []
+        self._dirty = False
+
+    @staticmethod
+    def _append(path: str, end: int, parts: List[bytes]):
+        """
+        Write parts to the blob at path right after its first end bytes
+
+        Bytes past end belong to no row (a store that was never loaded, or
+        a flush interrupted before its arrays were written) and are dropped.
+        """
+        with open(path, 'r+b' if end and os.path.exists(path) else 'wb') as f:
+            f.seek(end)
+            f.truncate()
+            f.write(b''.join(parts))
+
+    def __len__(self) -> int:
+        return self._live_count + len(self._pending_rows)
@@ -4,10 +4,59 @@ Handles text extraction and chunking strategies
 """
 import re
 from typing import List, Dict
+import numpy as np
 import logging
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, chunking falls back to pure Python
+    njit = None
+
+try:
+    import re2
+except ImportError:  # google-re2 is optional, sentence splitting falls back to re
+    re2 = None
+
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r"\s+")
+_DISALLOWED_CHARS_RE = re.compile(r"[^\w\s\.\,\!\?\;\:\-\(\)\[\]\{\}\"\'\/]")
+# Same character filter as a C-level translate table, valid for ASCII input
+_ASCII_DELETE_TABLE = str.maketrans(
+    "", "", "".join(c for c in map(chr, range(128)) if _DISALLOWED_CHARS_RE.match(c))
+)
+# RE2 matches in linear time; cleaned text only contains plain spaces, so
+# its ASCII-only \s behaves the same as the stdlib one here
+_SENTENCE_SPLIT_RE = (re2 if re2 is not None else re).compile(r"[.!?]+\s+")
+
+
+def _chunk_boundaries(lengths, chunk_size):
+    """
+    Compute chunk boundaries from per-sentence lengths
+
+    Sentences are accumulated until adding the next one would exceed
+    chunk_size. Chunk k spans sentences [bounds[k], bounds[k + 1]).
+    """
+    n = len(lengths)
+    bounds = np.empty(n + 1, dtype=np.int64)
+    bounds[0] = 0
+    count = 1
+    current = 0
+
+    for i in range(n):
+        length = lengths[i]
+        if current + length > chunk_size and i > bounds[count - 1]:
+            bounds[count] = i
+            count += 1
+            current = 0
+        current += length
+
+    bounds[count] = n
+    return bounds[:count + 1]
+
+
+_chunk_boundaries_native = njit(cache=True)(_chunk_boundaries) if njit is not None else None
+
 
 class DocumentProcessor:
     """
@@ -33,6 +82,26 @@ class DocumentProcessor:
             logger.error(f"Error extracting text: {str(e)}")
             raise
 
+    def extract_text_from_file(self, path: str, file_type: str) -> str:
+        """
+        Extract text from a file on disk
+
+        PDFs are handed to pypdf as an open file so pages are read from
+        disk on demand instead of from an in-memory copy of the upload.
+        """
+        try:
+            if file_type == '.txt':
+                with open(path, "rb") as f:
+                    return self._extract_from_txt(f.read())
+            elif file_type == '.pdf':
+                with open(path, "rb") as f:
+                    return self._extract_from_pdf(f)
+            else:
+                raise ValueError(f"Unsupported file type: {file_type}")
+        except Exception as e:
+            logger.error(f"Error extracting text: {str(e)}")
+            raise
+
     def _extract_from_txt(self, content: bytes) -> str:
         try:
             try:
@@ -44,8 +113,8 @@ class DocumentProcessor:
             logger.error(f"Error extracting text from TXT: {str(e)}")
             raise
 
-    def _extract_from_pdf(self, content: bytes) -> str:
-        """Extract text from PDF file using pypdf"""
+    def _extract_from_pdf(self, content) -> str:
+        """Extract text from PDF bytes or a binary PDF file object using pypdf"""
         try:
             import io
             from pypdf import PdfReader
@@ -54,21 +123,27 @@ class DocumentProcessor:
             return ""
 
         try:
-            pdf_file = io.BytesIO(content)
+            pdf_file = io.BytesIO(content) if isinstance(content, bytes) else content
             reader = PdfReader(pdf_file)
 
-            text_parts = []
+            # Write pages straight into one buffer instead of collecting
+            # per-page strings and joining them at the end
+            buf = io.StringIO()
+            first = True
             for page_num, page in enumerate(reader.pages):
                 try:
                     page_text = page.extract_text()
                     if page_text and page_text.strip():
-                        text_parts.append(page_text)
+                        if not first:
+                            buf.write("\n\n")
+                        buf.write(page_text)
+                        first = False
                 except Exception as e:
                     logger.warning(
                         f"Error extracting text from page {page_num}: {str(e)}"
                     )
 
-            return "\n\n".join(text_parts).strip()
+            return buf.getvalue().strip()
 
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
@@ -80,37 +155,23 @@ class DocumentProcessor:
             return []
 
         sentences = self._split_into_sentences(text)
+        if not sentences:
+            return []
 
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        chunk_index = 0
-
-        for sentence in sentences:
-            sentence_length = len(sentence)
-
-            if current_length + sentence_length > self.chunk_size and current_chunk:
-                chunk_text = " ".join(current_chunk)
-                chunks.append(
-                    self._create_chunk_dict(
-                        text=chunk_text,
-                        document_id=document_id,
-                        filename=filename,
-                        chunk_index=chunk_index,
-                    )
-                )
-                current_chunk = []
-                current_length = 0
-                chunk_index += 1
-
-            current_chunk.append(sentence)
-            current_length += sentence_length
+        if _chunk_boundaries_native is not None:
+            lengths = np.fromiter(
+                (len(s) for s in sentences), dtype=np.int64, count=len(sentences)
+            )
+            bounds = _chunk_boundaries_native(lengths, self.chunk_size)
+        else:
+            bounds = _chunk_boundaries([len(s) for s in sentences], self.chunk_size)
 
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
+        chunks = []
+        for chunk_index in range(len(bounds) - 1):
+            start, end = bounds[chunk_index], bounds[chunk_index + 1]
             chunks.append(
                 self._create_chunk_dict(
-                    text=chunk_text,
+                    text=" ".join(sentences[start:end]),
                     document_id=document_id,
                     filename=filename,
                     chunk_index=chunk_index,
@@ -120,12 +181,15 @@ class DocumentProcessor:
         return chunks
 
     def _clean_text(self, text: str) -> str:
-        text = re.sub(r"\s+", " ", text)
-        text = re.sub(r"[^\w\s\.\,\!\?\;\:\-\(\)\[\]\{\}\"\'\/]", "", text)
+        text = _WHITESPACE_RE.sub(" ", text)
+        if text.isascii():
+            text = text.translate(_ASCII_DELETE_TABLE)
+        else:
+            text = _DISALLOWED_CHARS_RE.sub("", text)
         return text.strip()
 
     def _split_into_sentences(self, text: str) -> List[str]:
-        sentences = re.split(r"[.!?]+\s+", text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         return [s.strip() for s in sentences if s.strip()]
 
     def _create_chunk_dict(
@@ -0,0 +1,171 @@
+"""
+Embedding Cache Module
+Persists embeddings keyed by content hash so unchanged text is never re-embedded
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional, keys fall back to sha256
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "RAG_EMBEDDING_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag", "embeddings.db"),
+)
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed embedding cache with an in-memory LRU front
+
+    Rows are keyed by (hash(text), model_id) so switching the embedding
+    model never serves stale vectors. The hash is the 16-byte xxh3_128
+    digest when xxhash is installed (far faster on large ingests), else
+    the 32-byte sha256; the lengths differ, so the two never collide.
+    The LRU front serves hot entries (repeated queries) without touching
+    the database.
+    """
+
+    SQL_BATCH = 500  # Stay well below SQLite's bound-parameter limit
+
+    def __init__(
+        self,
+        model_id: str,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        memory_size: int = 4096
+    ):
+        """
+        Initialize embedding cache
+
+        Args:
+            model_id: Identifier of the embedding model the vectors belong to
+            path: SQLite database path, or None for an in-memory only cache
+            memory_size: Maximum number of entries kept in the LRU front
+        """
+        self.model_id = model_id
+        self.path = path
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS emb ("
+                    "hash BLOB NOT NULL, model TEXT NOT NULL, vec BLOB NOT NULL, "
+                    "PRIMARY KEY (hash, model))"
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"Embedding cache at {path} unavailable: {str(e)}. Using memory only.")
+                self._conn = None
+
+        logger.info(f"EmbeddingCache initialized for {model_id} (persistent: {self._conn is not None})")
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        """Content hash used as cache key"""
+        if xxhash is not None:
+            return xxhash.xxh3_128_digest(text.encode())
+        return hashlib.sha256(text.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """Look up a single entry in the LRU front"""
+        with self._lock:
+            vec = self._memory.get(key)
+            if vec is not None:
+                self._memory.move_to_end(key)
+            return vec
+
+    def put(self, key: bytes, vec: np.ndarray):
+        """Insert a single entry into the LRU front"""
+        with self._lock:
+            self._remember(key, vec)
+
+    def get_many(self, keys: List[bytes]) -> Dict[int, np.ndarray]:
+        """
+        Look up a batch of entries
+
+        Args:
+            keys: Content hashes
+
+        Returns:
+            Mapping of position in `keys` to cached vector, for hits only
+        """
+        found: Dict[int, np.ndarray] = {}
+        missing: Dict[bytes, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._memory.get(key)
+                if vec is not None:
+                    found[i] = vec
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if self._conn is None or not missing:
+                return found
+
+            pending = list(missing)
+            for start in range(0, len(pending), self.SQL_BATCH):
+                batch = pending[start:start + self.SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM emb WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_id, *batch],
+                ).fetchall()
+
+                for key, blob in rows:
+                    vec = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, vec)
+                    for i in missing[key]:
+                        found[i] = vec
+
+        return found
+
+    def put_many(self, keys: List[bytes], vecs: np.ndarray):
+        """
+        Store a batch of entries in one transaction
+
+        Args:
+            keys: Content hashes
+            vecs: Array of shape (len(keys), dim)
+        """
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+
+        with self._lock:
+            for key, vec in zip(keys, vecs):
+                self._remember(key, vec.copy())
+
+            if self._conn is None:
+                return
+
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO emb (hash, model, vec) VALUES (?, ?, ?)",
+                        [(key, self.model_id, vec.tobytes()) for key, vec in zip(keys, vecs)],
+                    )
+            except Exception as e:
+                logger.warning(f"Error writing embedding cache: {str(e)}")
+
+    def _remember(self, key: bytes, vec: np.ndarray):
+        """Insert into the LRU front, evicting the oldest entry when full"""
+        vec.setflags(write=False)
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
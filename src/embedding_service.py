@@ -1,52 +1,152 @@
 """
 Ultra-fast local embedding service
 No internet. No downloads. <1s startup.
+
+Texts are embedded with the feature hashing trick: every token is hashed
+to a signed bucket of the output vector, so texts sharing vocabulary end
+up with a high cosine similarity.
 """
-from sentence_transformers import SentenceTransformer
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 import numpy as np
 import hashlib
 import logging
+import re
+
+from .embedding_cache import DEFAULT_CACHE_PATH, EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _hash_token(token: str) -> int:
+    """Stable 64-bit hash of a token (memoized, vocabularies are Zipfian)"""
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
 
 class EmbeddingService:
-    def __init__(self, embedding_dim: int = 384):
+    def __init__(self, embedding_dim: int = 384, cache_path: Optional[str] = DEFAULT_CACHE_PATH):
         self.embedding_dim = embedding_dim
+        self.model_id = f"feature-hash-blake2b-{embedding_dim}"
+        self.cache = EmbeddingCache(self.model_id, cache_path)
 
-    def embed_query(self, query: str):
-        return self._hash_text(query)
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed_chunks([text])[0]
 
-    def embed_text(self, text: str):
-        return self._hash_text(text)
+    def _hash_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts into an (N, embedding_dim) float32 matrix
 
-    def _hash_text(self, text: str):
-        vec = np.zeros(self.embedding_dim, dtype=np.float32)
-        h = hashlib.sha256(text.encode()).digest()
+        Token hashes pick the bucket (h % dim) and the sign (top bit), the
+        whole batch is scattered with a single bincount and L2-normalized once.
+        """
+        hashes = []
+        counts = np.empty(len(texts), dtype=np.intp)
+        for i, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            hashes.extend(_hash_token(t) for t in tokens)
+            counts[i] = len(tokens)
 
-        for i, b in enumerate(h):
-            vec[i % self.embedding_dim] += b
+        h = np.array(hashes, dtype=np.uint64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.intp), counts)
+        cols = (h % np.uint64(self.embedding_dim)).astype(np.intp)
+        signs = 1.0 - 2.0 * (h >> np.uint64(63)).astype(np.float64)
 
-        norm = np.linalg.norm(vec)
-        if norm > 0:
-            vec /= norm
+        vecs = np.bincount(
+            rows * self.embedding_dim + cols,
+            weights=signs,
+            minlength=len(texts) * self.embedding_dim,
+        ).reshape(len(texts), self.embedding_dim).astype(np.float32)
 
-        return vec
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        np.divide(vecs, norms, out=vecs, where=norms > 0)
+
+        return vecs
+
+    @staticmethod
+    def _token_batches(texts: List[str], max_tokens_per_batch: int) -> List[List[int]]:
+        """
+        Greedily pack text positions into batches of bounded token count
+
+        Tokens are estimated as len(text) // 4; a text larger than the
+        budget gets a batch of its own.
+        """
+        batches = []
+        current = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = max(1, len(text) // 4)
+            if current and current_tokens + tokens > max_tokens_per_batch:
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
 
+        return batches
 
-    def embed_chunks(self, texts: List[str]) -> np.ndarray:
+    def embed_chunks(self, texts: List[str], max_tokens_per_batch: int = 8192) -> np.ndarray:
         if not texts:
             return np.array([])
 
-        logger.info(f"Embedding {len(texts)} chunks (local)")
-        return np.vstack([self._hash_text(t) for t in texts])
+        keys = [EmbeddingCache.key(t) for t in texts]
+        cached = self.cache.get_many(keys)
+        missing = [i for i in range(len(texts)) if i not in cached]
+
+        logger.info(f"Embedding {len(texts)} chunks (local, {len(cached)} cached)")
+
+        vecs = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        for i, vec in cached.items():
+            vecs[i] = vec
+
+        # Bounded batches keep the working set (and any future model's
+        # per-request token limit) in check on long documents
+        for batch in self._token_batches([texts[i] for i in missing], max_tokens_per_batch):
+            positions = [missing[j] for j in batch]
+            fresh = self._hash_texts([texts[i] for i in positions])
+            vecs[positions] = fresh
+            self.cache.put_many([keys[i] for i in positions], fresh)
+
+        return vecs
 
     def embed_query(self, query: str) -> np.ndarray:
         if not query.strip():
             raise ValueError("Query cannot be empty")
 
-        return self._hash_text(query)
+        key = EmbeddingCache.key(query)
+        vec = self.cache.get(key)
+        if vec is None:
+            vec = self._hash_texts([query])[0]
+            self.cache.put(key, vec)
+
+        return vec
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        embed_query for several queries, hashing the uncached ones together
+
+        Like embed_query, only the in-memory LRU front is used, so queries
+        are never written to the persistent chunk cache.
+        """
+        if any(not query.strip() for query in queries):
+            raise ValueError("Query cannot be empty")
+
+        keys = [EmbeddingCache.key(q) for q in queries]
+        vecs = [self.cache.get(key) for key in keys]
+        missing = [i for i, vec in enumerate(vecs) if vec is None]
+        if missing:
+            fresh = self._hash_texts([queries[i] for i in missing])
+            for i, vec in zip(missing, fresh):
+                self.cache.put(keys[i], vec)
+                vecs[i] = vec
+
+        return np.stack(vecs) if vecs else np.empty((0, self.embedding_dim), dtype=np.float32)
 
     def get_embedding_dimension(self) -> int:
         return self.embedding_dim
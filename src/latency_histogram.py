@@ -0,0 +1,176 @@
+"""
+Latency Histogram Module
+Exponential latency histogram that can be shared between worker processes
+"""
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional
+import numpy as np
+import logging
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, row claims are then unlocked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Prometheus-style exponential histogram of latencies
+
+    Bucket k counts observations <= base_ms * factor**k, the last bucket is
+    unbounded. Counts live in a (num_workers, num_buckets + 1) int64 array;
+    column 0 holds the pid owning each row. With a shared memory name every
+    worker process claims its own row, so observe() is a single unlocked
+    increment and snapshot() merges all workers with one sum over axis 0.
+    """
+
+    def __init__(
+        self,
+        num_buckets: int = 24,
+        base_ms: float = 0.1,
+        factor: float = 2.0,
+        shm_name: Optional[str] = None,
+        num_workers: int = 1
+    ):
+        """
+        Initialize latency histogram
+
+        Args:
+            num_buckets: Number of buckets including the unbounded one
+            base_ms: Upper bound of the first bucket
+            factor: Ratio between consecutive bucket bounds
+            shm_name: Shared memory block to attach to (created if missing),
+                or None for a process-local histogram
+            num_workers: Number of worker rows in the shared block
+        """
+        self.upper_bounds_ms = base_ms * factor ** np.arange(num_buckets - 1)
+        self.num_buckets = num_buckets
+        self._shm = None
+        self._shm_name = shm_name
+
+        shape = (num_workers, num_buckets + 1)
+        self._table = None
+
+        # Creating, zero-filling and claiming a row happen under one lock so
+        # a worker attaching early cannot have its claim wiped by the creator
+        with self._claim_lock():
+            if shm_name:
+                try:
+                    self._shm = self._open_shared(shm_name, shape)
+                    self._table = np.ndarray(shape, dtype=np.int64, buffer=self._shm.buf)
+                except Exception as e:
+                    logger.warning(f"Shared histogram {shm_name} unavailable: {str(e)}. Using process-local counts.")
+                    self._shm = None
+
+            if self._table is None:
+                self._table = np.zeros((1, num_buckets + 1), dtype=np.int64)
+
+            self._row = self._claim_row()
+        self._counts = self._table[self._row, 1:]
+
+        logger.info(
+            f"LatencyHistogram initialized: {num_buckets} buckets, "
+            f"shared={self._shm is not None}, row={self._row}"
+        )
+
+    @staticmethod
+    def _open_shared(name: str, shape) -> shared_memory.SharedMemory:
+        """Attach to the named block, creating it zero-filled on first use"""
+        size = int(np.prod(shape)) * np.dtype(np.int64).itemsize
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            np.ndarray(shape, dtype=np.int64, buffer=shm.buf).fill(0)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name)
+            if shm.size < size:
+                raise ValueError(f"existing block is {shm.size} bytes, need {size}")
+
+        # The block outlives any single worker; keep the resource tracker
+        # from unlinking it when the process that created it exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    @contextmanager
+    def _claim_lock(self):
+        """Serialize row claims of workers starting at the same time"""
+        if not self._shm_name or fcntl is None:
+            yield
+            return
+
+        path = os.path.join(tempfile.gettempdir(), f"{self._shm_name}.lock")
+        with open(path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _claim_row(self) -> int:
+        """Claim a worker row, reusing rows of workers that have exited"""
+        pid = os.getpid()
+        owners = self._table[:, 0]
+
+        for row in range(len(owners)):
+            owner = int(owners[row])
+            if owner == pid or owner == 0 or not self._pid_alive(owner):
+                owners[row] = pid
+                return row
+
+        # More workers than rows: share the last one (counts stay exact
+        # except for the rare lost increment under contention)
+        logger.warning("No free histogram row, sharing the last one")
+        return len(owners) - 1
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def observe(self, value_ms: float):
+        """Record one latency observation"""
+        self._counts[np.searchsorted(self.upper_bounds_ms, value_ms)] += 1
+
+    def snapshot(self) -> Dict:
+        """
+        Merge counts across all workers
+
+        Returns:
+            Dictionary with bucket bounds, merged counts (one more than
+            bounds, the last is the overflow bucket) and estimated
+            p50/p95/p99 (upper bound of the bucket holding each rank)
+        """
+        counts = self._table[:, 1:].sum(axis=0)
+        total = int(counts.sum())
+
+        snapshot = {
+            'count': total,
+            'upper_bounds_ms': self.upper_bounds_ms.tolist(),
+            'counts': counts.tolist(),
+            'workers': int(np.count_nonzero(self._table[:, 0]))
+        }
+
+        cumulative = np.cumsum(counts)
+        for p in (50, 95, 99):
+            if total == 0:
+                snapshot[f'p{p}_ms'] = 0.0
+                continue
+            bucket = int(np.searchsorted(cumulative, total * p / 100))
+            # Ranks in the overflow bucket are reported at the last bound
+            bucket = min(bucket, len(self.upper_bounds_ms) - 1)
+            snapshot[f'p{p}_ms'] = float(self.upper_bounds_ms[bucket])
+
+        return snapshot
+
+    def reset(self):
+        """Reset this worker's counts"""
+        self._counts.fill(0)
@@ -3,15 +3,18 @@ RAG-Based Question Answering System
 Main FastAPI application with document upload and query endpoints
 """
 
+import asyncio
 import logging
+import os
+import tempfile
 import time
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Annotated, List
 
 import uvicorn
 from fastapi import (
-    BackgroundTasks,
     Depends,
     FastAPI,
     File,
@@ -21,12 +24,13 @@ from fastapi import (
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, StringConstraints
 
 from src.answer_generator import AnswerGenerator
 from src.document_processor import DocumentProcessor
 from src.embedding_service import EmbeddingService
 from src.metrics_tracker import MetricsTracker
+from src.query_cache import QueryCache
 from src.rate_limiter import RateLimiter
 from src.retrieval_service import RetrievalService
 from src.vector_store import VectorStore
@@ -85,18 +89,17 @@ retrieval_service = RetrievalService(vector_store, embedding_service)
 answer_generator = AnswerGenerator()
 rate_limiter = RateLimiter(max_requests=10, window_seconds=60)
 metrics_tracker = MetricsTracker()
+query_cache = QueryCache(max_size=1024)
 
 # -------------------------------------------------------------------
 # Pydantic Models
 # -------------------------------------------------------------------
 class QueryRequest(BaseModel):
-    question: str = Field(..., min_length=3, max_length=500)
+    question: Annotated[
+        str, StringConstraints(strip_whitespace=True, min_length=3, max_length=500)
+    ]
     top_k: int = Field(default=3, ge=1, le=10)
 
-    @validator("question")
-    def clean_question(cls, v):
-        return v.strip()
-
 
 class QueryResponse(BaseModel):
     answer: str
@@ -133,37 +136,57 @@ async def check_rate_limit(user_id: str = "anonymous"):
 # -------------------------------------------------------------------
 # Endpoints
 # -------------------------------------------------------------------
+ALLOWED_EXTENSIONS = frozenset({".pdf", ".txt"})
+
+# Uploads are copied to disk in pieces of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Load balancer probes within this window get the memoized response
+HEALTH_TTL_NS = 1_000_000_000
+_health_cache = {"expires_ns": 0, "response": None}
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health():
-    stats = vector_store.get_stats()
-    return HealthResponse(
-        status="healthy",
-        timestamp=datetime.utcnow().isoformat(),
-        documents_indexed=stats["documents"],
-        total_chunks=stats["chunks"],
-    )
+    now = time.perf_counter_ns()
+    if now >= _health_cache["expires_ns"]:
+        stats = vector_store.get_stats()
+        _health_cache["response"] = HealthResponse(
+            status="healthy",
+            timestamp=datetime.utcnow().isoformat(),
+            documents_indexed=stats["documents"],
+            total_chunks=stats["chunks"],
+        )
+        _health_cache["expires_ns"] = now + HEALTH_TTL_NS
+    return _health_cache["response"]
 
 
 @app.post("/upload", response_model=DocumentUploadResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_id: str = Depends(check_rate_limit),
 ):
-    ext = "." + file.filename.split(".")[-1].lower()
-    if ext not in [".pdf", ".txt"]:
+    ext = os.path.splitext(file.filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    content = await file.read()
-    document_id = f"doc_{int(time.time())}_{file.filename}"
+    # Spool the upload to disk in bounded chunks instead of reading it
+    # into memory whole; the indexing workers work from the file. Disk
+    # writes run in a thread so they do not block the event loop
+    fd, path = tempfile.mkstemp(suffix=ext)
+    document_id = uuid.uuid4().hex
 
-    background_tasks.add_task(
-        process_document,
-        document_id,
-        file.filename,
-        content,
-        ext,
-    )
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(spool.write, chunk)
+
+        # Blocks while the queue is full, applying backpressure on bursts
+        await app.state.index_queue.put((document_id, file.filename, path, ext))
+    except BaseException:
+        # Failed or cancelled uploads would otherwise leak their temp file
+        os.unlink(path)
+        raise
 
     return DocumentUploadResponse(
         document_id=document_id,
@@ -173,18 +196,123 @@ async def upload_document(
     )
 
 
-async def process_document(document_id: str, filename: str, content: bytes, ext: str):
-    text = document_processor.extract_text(content, ext)
-    chunks = document_processor.chunk_text(text, document_id, filename)
+# -------------------------------------------------------------------
+# Background indexing
+# -------------------------------------------------------------------
+INDEX_QUEUE_SIZE = 64
+INDEX_WORKERS = 2
+INDEX_BATCH_SIZE = 32
+INDEX_BATCH_WAIT_SECONDS = 0.5
+
+
+@app.on_event("startup")
+async def start_index_workers():
+    app.state.index_queue = asyncio.Queue(maxsize=INDEX_QUEUE_SIZE)
+    # Workers overlap extraction but take turns on the embed + index step,
+    # so batches are added in order; VectorStore locks out searches only
+    # while it changes the index
+    app.state.index_lock = asyncio.Lock()
+    app.state.index_workers = [
+        asyncio.create_task(index_worker()) for _ in range(INDEX_WORKERS)
+    ]
+
 
-    if not chunks:
-        logger.warning(f"No chunks created for {document_id}")
+@app.on_event("shutdown")
+async def stop_index_workers():
+    for task in app.state.index_workers:
+        task.cancel()
+    await asyncio.gather(*app.state.index_workers, return_exceptions=True)
+
+
+async def index_worker():
+    """Drain the upload queue, indexing pending documents in batches"""
+    queue = app.state.index_queue
+    loop = asyncio.get_running_loop()
+
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + INDEX_BATCH_WAIT_SECONDS
+        while len(batch) < INDEX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            await process_documents(batch)
+        except Exception as e:
+            logger.error(f"Error indexing batch of {len(batch)} documents: {str(e)}")
+            metrics_tracker.track_error("indexing", str(e))
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+def _extract_chunks(document_id: str, filename: str, path: str, ext: str) -> List[dict]:
+    try:
+        text = document_processor.extract_text_from_file(path, ext)
+    finally:
+        os.unlink(path)
+    return document_processor.chunk_text(text, document_id, filename)
+
+
+async def process_documents(batch: List[tuple]):
+    """
+    Index a batch of uploaded documents
+
+    Extraction runs concurrently in threads, then the chunks of the whole
+    batch are embedded with a single embed_chunks call.
+    """
+    t0 = time.perf_counter_ns()
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_extract_chunks, *item) for item in batch),
+        return_exceptions=True,
+    )
+    extract_ms = (time.perf_counter_ns() - t0) * 1e-6
+
+    documents = []
+    for (document_id, _, _, _), chunks in zip(batch, results):
+        if isinstance(chunks, Exception):
+            logger.error(f"Error processing {document_id}: {str(chunks)}")
+            metrics_tracker.track_error("document_processing", str(chunks))
+        elif not chunks:
+            logger.warning(f"No chunks created for {document_id}")
+        else:
+            documents.append((document_id, chunks))
+
+    if not documents:
         return
 
-    embeddings = embedding_service.embed_chunks([c["text"] for c in chunks])
-    vector_store.add_documents(chunks, embeddings, document_id)
-
-    logger.info(f"Indexed document {document_id} with {len(chunks)} chunks")
+    texts = [c["text"] for _, chunks in documents for c in chunks]
+
+    async with app.state.index_lock:
+        t1 = time.perf_counter_ns()
+        embeddings = await asyncio.to_thread(embedding_service.embed_chunks, texts)
+
+        def add_all():
+            offset = 0
+            for document_id, chunks in documents:
+                vector_store.add_documents(
+                    chunks, embeddings[offset:offset + len(chunks)], document_id
+                )
+                offset += len(chunks)
+            vector_store.flush()
+
+        await asyncio.to_thread(add_all)
+        query_cache.clear()
+        index_ms = (time.perf_counter_ns() - t1) * 1e-6
+
+    # Embedding and indexing time is attributed by share of chunks
+    for document_id, chunks in documents:
+        metrics_tracker.track_document_processing(
+            document_id,
+            len(chunks),
+            extract_ms + index_ms * len(chunks) / len(texts),
+        )
+        logger.info(f"Indexed document {document_id} with {len(chunks)} chunks")
 
 
 @app.post("/query", response_model=QueryResponse)
@@ -192,42 +320,83 @@ async def query_documents(
     req: QueryRequest,
     user_id: str = Depends(check_rate_limit),
 ):
-    start_retrieval = time.time()
-    retrieved_chunks = retrieval_service.retrieve(req.question, req.top_k)
-    retrieval_time_ms = (time.time() - start_retrieval) * 1000
+    t0 = time.perf_counter_ns()
+
+    # Repeated questions skip retrieval and generation until the next index
+    cache_key = QueryCache.key(req.question, req.top_k)
+    cached = query_cache.get(cache_key)
+    if cached is not None:
+        metrics_tracker.track_query(
+            req.question,
+            cached["chunks_retrieved"],
+            0.0,
+            0.0,
+            (time.perf_counter_ns() - t0) * 1e-6,
+            cached["confidence_score"],
+        )
+        return QueryResponse(**cached, retrieval_time_ms=0.0, generation_time_ms=0.0)
+
+    # Off the event loop: searches wait while an indexing batch holds the store
+    retrieved_chunks = await asyncio.to_thread(
+        retrieval_service.retrieve, req.question, req.top_k
+    )
+    t1 = time.perf_counter_ns()
+    retrieval_time_ms = (t1 - t0) * 1e-6
 
     if not retrieved_chunks:
+        metrics_tracker.track_query(
+            req.question, 0, retrieval_time_ms, 0.0, retrieval_time_ms, 0.0
+        )
+        result = {
+            "answer": "No relevant information found.",
+            "sources": [],
+            "confidence_score": 0.0,
+            "chunks_retrieved": 0,
+        }
+        query_cache.put(cache_key, result)
         return QueryResponse(
-            answer="No relevant information found.",
-            sources=[],
-            confidence_score=0.0,
+            **result,
             retrieval_time_ms=retrieval_time_ms,
             generation_time_ms=0.0,
-            chunks_retrieved=0,
         )
 
-    start_generation = time.time()
     answer, confidence = answer_generator.generate_answer(
         req.question, retrieved_chunks
     )
-    generation_time_ms = (time.time() - start_generation) * 1000
+    t2 = time.perf_counter_ns()
+    generation_time_ms = (t2 - t1) * 1e-6
+
+    metrics_tracker.track_query(
+        req.question,
+        len(retrieved_chunks),
+        retrieval_time_ms,
+        generation_time_ms,
+        (t2 - t0) * 1e-6,
+        confidence,
+    )
 
     sources = [
         {
-            "document": c["metadata"]["filename"],
-            "chunk_id": c["metadata"]["chunk_id"],
+            "document": meta["filename"],
+            "chunk_id": meta["chunk_id"],
             "similarity": round(c["score"], 4),
         }
         for c in retrieved_chunks
+        for meta in (c["metadata"],)
     ]
 
+    result = {
+        "answer": answer,
+        "sources": sources,
+        "confidence_score": confidence,
+        "chunks_retrieved": len(retrieved_chunks),
+    }
+    query_cache.put(cache_key, result)
+
     return QueryResponse(
-        answer=answer,
-        sources=sources,
-        confidence_score=confidence,
+        **result,
         retrieval_time_ms=retrieval_time_ms,
         generation_time_ms=generation_time_ms,
-        chunks_retrieved=len(retrieved_chunks),
     )
 
 
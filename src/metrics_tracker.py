@@ -4,7 +4,12 @@ Tracks and reports system performance metrics
 """
 from typing import Dict, List
 from datetime import datetime
+import numpy as np
 import logging
+import os
+import time
+
+from .latency_histogram import LatencyHistogram
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +23,46 @@ class MetricsTracker:
     - Similarity scores
     - Document processing time
     - Error rates
+
+    Query metrics are kept in a fixed-capacity columnar ring buffer, so
+    memory is bounded and aggregation over the window is vectorized.
+    Total query latency is also recorded in a LatencyHistogram; when
+    RAG_METRICS_SHM names a shared memory block, the histogram aggregates
+    across all worker processes (RAG_METRICS_WORKERS rows, default cpu count).
     """
+
+    # Column layout of the query ring buffer
+    QUERY_FIELDS = (
+        'question_length',
+        'chunks_retrieved',
+        'retrieval_time_ms',
+        'generation_time_ms',
+        'total_time_ms',
+        'confidence_score'
+    )
+    _TOTAL_TIME_COL = QUERY_FIELDS.index('total_time_ms')
     
-    def __init__(self):
-        """Initialize metrics tracker"""
-        self.queries: List[Dict] = []
+    def __init__(self, query_capacity: int = 10000, cache_ttl_seconds: float = 1.0):
+        """
+        Initialize metrics tracker
+
+        Args:
+            query_capacity: Number of most recent queries kept for aggregation
+            cache_ttl_seconds: How long get_metrics() reuses its last result
+        """
+        self.query_capacity = query_capacity
+        self._queries = np.zeros((query_capacity, len(self.QUERY_FIELDS)), dtype=np.float64)
+        self._query_index = 0
+        self.total_queries = 0
+        self.latency_histogram = LatencyHistogram(
+            shm_name=os.environ.get("RAG_METRICS_SHM"),
+            num_workers=int(os.environ.get("RAG_METRICS_WORKERS", os.cpu_count() or 1))
+        )
         self.documents: List[Dict] = []
         self.errors: List[Dict] = []
+        self._cache_ttl_ns = int(cache_ttl_seconds * 1e9)
+        self._cached_metrics = None
+        self._cached_at_ns = 0
         
         logger.info("MetricsTracker initialized")
     
@@ -48,17 +86,17 @@ class MetricsTracker:
             total_time_ms: Total query time
             confidence_score: Confidence of the answer
         """
-        metric = {
-            'timestamp': datetime.now().isoformat(),
-            'question_length': len(question),
-            'chunks_retrieved': chunks_retrieved,
-            'retrieval_time_ms': retrieval_time_ms,
-            'generation_time_ms': generation_time_ms,
-            'total_time_ms': total_time_ms,
-            'confidence_score': confidence_score
-        }
-        
-        self.queries.append(metric)
+        self._queries[self._query_index] = (
+            len(question),
+            chunks_retrieved,
+            retrieval_time_ms,
+            generation_time_ms,
+            total_time_ms,
+            confidence_score
+        )
+        self._query_index = (self._query_index + 1) % self.query_capacity
+        self.total_queries += 1
+        self.latency_histogram.observe(total_time_ms)
         
         # Log warning if query is slow
         if total_time_ms > 5000:  # 5 seconds
@@ -79,7 +117,7 @@ class MetricsTracker:
             processing_time_ms: Processing time
         """
         metric = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.time_ns(),
             'document_id': document_id,
             'chunks_created': chunks_created,
             'processing_time_ms': processing_time_ms,
@@ -99,7 +137,7 @@ class MetricsTracker:
             error_message: Error message
         """
         error = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.time_ns(),
             'error_type': error_type,
             'error_message': error_message
         }
@@ -110,29 +148,40 @@ class MetricsTracker:
     def get_metrics(self) -> Dict:
         """
         Get aggregated metrics
+
+        The result is memoized for cache_ttl_seconds, so frequent scrapes
+        do not re-aggregate on every call.
         
         Returns:
             Dictionary containing metric summaries
         """
-        return {
+        now = time.perf_counter_ns()
+        if self._cached_metrics is not None and now - self._cached_at_ns < self._cache_ttl_ns:
+            return self._cached_metrics
+
+        self._cached_metrics = {
             'summary': self._get_summary(),
             'query_metrics': self._get_query_metrics(),
+            'latency_histogram': self.latency_histogram.snapshot(),
             'document_metrics': self._get_document_metrics(),
             'error_metrics': self._get_error_metrics()
         }
+        self._cached_at_ns = now
+        return self._cached_metrics
     
     def _get_summary(self) -> Dict:
         """Get high-level summary"""
         return {
-            'total_queries': len(self.queries),
+            'total_queries': self.total_queries,
             'total_documents': len(self.documents),
             'total_errors': len(self.errors),
-            'error_rate': len(self.errors) / max(len(self.queries), 1)
+            'error_rate': len(self.errors) / max(self.total_queries, 1)
         }
     
     def _get_query_metrics(self) -> Dict:
-        """Get query-specific metrics"""
-        if not self.queries:
+        """Get query-specific metrics over the ring buffer window"""
+        window = self._query_window()
+        if not len(window):
             return {
                 'count': 0,
                 'avg_retrieval_time_ms': 0,
@@ -142,17 +191,24 @@ class MetricsTracker:
                 'avg_chunks_retrieved': 0
             }
         
+        means = dict(zip(self.QUERY_FIELDS, window.mean(axis=0).tolist()))
+        p50, p95, p99 = self._percentiles(window[:, self._TOTAL_TIME_COL], (50, 95, 99))
+
         return {
-            'count': len(self.queries),
-            'avg_retrieval_time_ms': sum(q['retrieval_time_ms'] for q in self.queries) / len(self.queries),
-            'avg_generation_time_ms': sum(q['generation_time_ms'] for q in self.queries) / len(self.queries),
-            'avg_total_time_ms': sum(q['total_time_ms'] for q in self.queries) / len(self.queries),
-            'avg_confidence': sum(q['confidence_score'] for q in self.queries) / len(self.queries),
-            'avg_chunks_retrieved': sum(q['chunks_retrieved'] for q in self.queries) / len(self.queries),
-            'p50_total_time_ms': self._percentile([q['total_time_ms'] for q in self.queries], 50),
-            'p95_total_time_ms': self._percentile([q['total_time_ms'] for q in self.queries], 95),
-            'p99_total_time_ms': self._percentile([q['total_time_ms'] for q in self.queries], 99)
+            'count': len(window),
+            'avg_retrieval_time_ms': means['retrieval_time_ms'],
+            'avg_generation_time_ms': means['generation_time_ms'],
+            'avg_total_time_ms': means['total_time_ms'],
+            'avg_confidence': means['confidence_score'],
+            'avg_chunks_retrieved': means['chunks_retrieved'],
+            'p50_total_time_ms': p50,
+            'p95_total_time_ms': p95,
+            'p99_total_time_ms': p99
         }
+
+    def _query_window(self) -> np.ndarray:
+        """View of the filled rows of the query ring buffer"""
+        return self._queries[:min(self.total_queries, self.query_capacity)]
     
     def _get_document_metrics(self) -> Dict:
         """Get document processing metrics"""
@@ -188,23 +244,40 @@ class MetricsTracker:
         return {
             'count': len(self.errors),
             'by_type': error_counts,
-            'recent_errors': self.errors[-5:]  # Last 5 errors
+            'recent_errors': [  # Last 5 errors
+                {**error, 'timestamp': self._format_timestamp(error['timestamp'])}
+                for error in self.errors[-5:]
+            ]
         }
     
-    def _percentile(self, values: List[float], percentile: int) -> float:
-        """Calculate percentile of values"""
-        if not values:
-            return 0.0
+    @staticmethod
+    def _format_timestamp(timestamp_ns: int) -> str:
+        """Format a time.time_ns() timestamp, deferred until it is reported"""
+        return datetime.fromtimestamp(timestamp_ns / 1e9).isoformat()
+
+    def _percentiles(self, values: np.ndarray, percentiles) -> List[float]:
+        """
+        Calculate several percentiles of values
+
+        A single np.partition places every requested rank in its sorted
+        position in O(N), instead of fully sorting once per percentile.
+        """
+        if not len(values):
+            return [0.0] * len(percentiles)
         
-        sorted_values = sorted(values)
-        index = int(len(sorted_values) * percentile / 100)
-        index = min(index, len(sorted_values) - 1)
+        n = len(values)
+        indices = [min(int(n * p / 100), n - 1) for p in percentiles]
+        partitioned = np.partition(values, indices)
         
-        return sorted_values[index]
+        return [float(partitioned[i]) for i in indices]
     
     def reset_metrics(self):
         """Reset all metrics"""
-        self.queries = []
+        self._queries.fill(0)
+        self._query_index = 0
+        self.total_queries = 0
+        self.latency_histogram.reset()
         self.documents = []
         self.errors = []
+        self._cached_metrics = None
         logger.info("Metrics reset")
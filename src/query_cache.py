@@ -0,0 +1,73 @@
+"""
+Query Cache Module
+LRU cache of query results for repeated questions
+"""
+from collections import OrderedDict
+from typing import Any, Optional
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """
+    LRU cache of query results keyed by question and query parameters
+
+    Keys are fixed-size blake2b digests so long questions do not bloat the
+    cache. Entries optionally expire after ttl_seconds. Callers must clear()
+    the cache whenever the index changes.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Initialize query cache
+
+        Args:
+            max_size: Maximum number of cached results
+            ttl_seconds: Lifetime of an entry, or None to keep entries until evicted
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        logger.info(f"QueryCache initialized with max_size={max_size}, ttl_seconds={ttl_seconds}")
+
+    @staticmethod
+    def key(question: str, *params) -> bytes:
+        """Cache key for a question and the parameters it was asked with"""
+        return hashlib.blake2b(f"{params!r}\x00{question}".encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return the cached result for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            stored_at, result = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: bytes, result: Any):
+        """Cache a result, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
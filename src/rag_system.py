@@ -3,22 +3,33 @@ Advanced RAG System with Semantic Chunking and Hybrid Retrieval
 """
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 import numpy as np
+from scipy import sparse
 from dataclasses import dataclass
-from collections import defaultdict
 import re
 
+from query_cache import QueryCache
+from vector_backends import create_backend
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, BM25 scoring falls back to SciPy
+    njit = None
+
+try:
+    import cupy as cp
+    import cupyx
+except ImportError:  # cupy is optional, BM25 scoring stays on the CPU
+    cp = None
+
 try:
     from sentence_transformers import SentenceTransformer
-    import chromadb
-    from chromadb.config import Settings
 except ImportError:
     print("Installing required packages...")
     os.system("pip install sentence-transformers chromadb anthropic --break-system-packages")
     from sentence_transformers import SentenceTransformer
-    import chromadb
-    from chromadb.config import Settings
 
 
 @dataclass
@@ -58,6 +69,11 @@ class SemanticChunker:
     3. Overlapping windows - maintains context across boundaries
     """
     
+    _ABBREVIATION_RE = re.compile(r'\b(Dr|Mr|Mrs|Ms|Prof|Sr|Jr)\.')
+    _SENTENCE_END_RE = re.compile(r'[.!?]+\s+')
+    _PUNCTUATION = '.,;:!?'
+    _DELETE_PUNCTUATION = str.maketrans('', '', _PUNCTUATION)
+    
     def __init__(
         self, 
         target_chunk_size: int = 512,
@@ -75,23 +91,46 @@ class SemanticChunker:
         Calculate semantic density - how much information per character.
         Higher density = more complex content = smaller chunks preferred.
         """
-        # Simple heuristic: unique word ratio, punctuation density
         words = text.lower().split()
-        if not words:
+        return self._density(
+            len(set(words)),
+            len(words),
+            len(text) - len(text.translate(self._DELETE_PUNCTUATION)),
+            len(text)
+        )
+    
+    @staticmethod
+    def _density(unique_count: int, word_count: int, punct_count: int, length: int) -> float:
+        """Semantic density from a text's unique and total word counts, punctuation count and length"""
+        # Simple heuristic: unique word ratio, punctuation density
+        if not word_count:
             return 0.0
         
-        unique_ratio = len(set(words)) / len(words)
-        punct_density = sum(1 for c in text if c in '.,;:!?') / len(text)
+        unique_ratio = unique_count / word_count
+        punct_density = punct_count / length
         
         # Normalize to 0-1 range
         density = (unique_ratio * 0.7 + punct_density * 10 * 0.3)
         return min(1.0, density)
     
+    def _chunk_density(self, indices: List[int], words, punct_counts, lengths) -> float:
+        """
+        Density of the sentences at indices joined with spaces, computed
+        from per-sentence statistics instead of rescanning the joined text
+        """
+        # The union and the counts run per sentence, not per word
+        return self._density(
+            len(set().union(*(words[i] for i in indices))),
+            sum(len(words[i]) for i in indices),
+            sum(punct_counts[i] for i in indices),
+            sum(lengths[i] for i in indices) + len(indices) - 1
+        )
+    
     def _split_into_sentences(self, text: str) -> List[str]:
         """Split text into sentences using regex"""
         # Handle common abbreviations
-        text = re.sub(r'\b(Dr|Mr|Mrs|Ms|Prof|Sr|Jr)\.', r'\1<PERIOD>', text)
-        sentences = re.split(r'[.!?]+\s+', text)
+        text = self._ABBREVIATION_RE.sub(r'\1<PERIOD>', text)
+        sentences = self._SENTENCE_END_RE.split(text)
         # Restore periods
         sentences = [s.replace('<PERIOD>', '.') for s in sentences]
         return [s.strip() for s in sentences if s.strip()]
@@ -101,15 +140,24 @@ class SemanticChunker:
         Chunk text using semantic boundaries with adaptive sizing.
         """
         sentences = self._split_into_sentences(text)
+        
+        # Per-sentence statistics, computed once and reused for both the
+        # sentence and the chunk densities
+        lengths = [len(s) for s in sentences]
+        words = [s.lower().split() for s in sentences]
+        punct_counts = [
+            length - len(s.translate(self._DELETE_PUNCTUATION))
+            for s, length in zip(sentences, lengths)
+        ]
+        
         chunks = []
-        current_chunk = []
+        current_chunk = []  # sentence indices
         current_size = 0
         char_position = 0
         chunk_index = 0
         
-        for i, sentence in enumerate(sentences):
-            sentence_len = len(sentence)
-            density = self._calculate_semantic_density(sentence)
+        for i, sentence_len in enumerate(lengths):
+            density = self._density(len(set(words[i])), len(words[i]), punct_counts[i], sentence_len)
             
             # Adjust target size based on density
             adjusted_target = int(self.target_chunk_size * (1.5 - density))
@@ -118,7 +166,7 @@ class SemanticChunker:
             # Check if adding this sentence would exceed our target
             if current_size + sentence_len > adjusted_target and current_chunk:
                 # Create chunk from accumulated sentences
-                chunk_text = ' '.join(current_chunk)
+                chunk_text = ' '.join(sentences[j] for j in current_chunk)
                 chunk_start = char_position - current_size
                 
                 metadata = ChunkMetadata(
@@ -127,7 +175,7 @@ class SemanticChunker:
                     chunk_index=chunk_index,
                     char_start=chunk_start,
                     char_end=char_position,
-                    semantic_density=self._calculate_semantic_density(chunk_text),
+                    semantic_density=self._chunk_density(current_chunk, words, punct_counts, lengths),
                     overlap_previous=chunk_index > 0,
                     overlap_next=i < len(sentences) - 1
                 )
@@ -137,23 +185,23 @@ class SemanticChunker:
                 # Start new chunk with overlap
                 if self.overlap_tokens > 0 and current_chunk:
                     # Keep last sentence(s) for overlap
-                    overlap_text = current_chunk[-1]
-                    current_chunk = [overlap_text, sentence]
-                    current_size = len(overlap_text) + sentence_len
+                    overlap = current_chunk[-1]
+                    current_chunk = [overlap, i]
+                    current_size = lengths[overlap] + sentence_len
                 else:
-                    current_chunk = [sentence]
+                    current_chunk = [i]
                     current_size = sentence_len
                 
                 chunk_index += 1
             else:
-                current_chunk.append(sentence)
+                current_chunk.append(i)
                 current_size += sentence_len
             
             char_position += sentence_len + 1  # +1 for space
         
         # Add final chunk
         if current_chunk:
-            chunk_text = ' '.join(current_chunk)
+            chunk_text = ' '.join(sentences[j] for j in current_chunk)
             chunk_start = char_position - current_size
             
             metadata = ChunkMetadata(
@@ -162,7 +210,7 @@ class SemanticChunker:
                 chunk_index=chunk_index,
                 char_start=chunk_start,
                 char_end=char_position,
-                semantic_density=self._calculate_semantic_density(chunk_text),
+                semantic_density=self._chunk_density(current_chunk, words, punct_counts, lengths),
                 overlap_previous=chunk_index > 0,
                 overlap_next=False
             )
@@ -172,6 +220,23 @@ class SemanticChunker:
         return chunks
 
 
+def _bm25_scores(term_ids, data, indices, indptr, n_chunks):
+    """
+    Sum the precomputed BM25 rows of the query terms
+    
+    Walks each term's posting list in the CSR arrays and accumulates into
+    a dense score vector, without materializing the row slice.
+    """
+    scores = np.zeros(n_chunks, dtype=np.float32)
+    for t in term_ids:
+        for i in range(indptr[t], indptr[t + 1]):
+            scores[indices[i]] += data[i]
+    return scores
+
+
+_bm25_scores_native = njit(cache=True)(_bm25_scores) if njit is not None else None
+
+
 class HybridRetriever:
     """
     Implements hybrid retrieval combining:
@@ -180,42 +245,340 @@ class HybridRetriever:
     3. Metadata filtering
     """
     
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2"):
+    # BM25 parameters
+    K1 = 1.5
+    B = 0.75
+    
+    _TOKEN_RE = re.compile(r"\w+")
+    
+    # Arrays of the persisted keyword index, one .npy file each
+    _INDEX_ARRAYS = (
+        'bm25_data', 'bm25_indices', 'bm25_indptr',
+        'tf_terms', 'tf_chunks', 'tf_counts', 'doc_lengths',
+        'vocab', 'chunk_ids'
+    )
+    
+    # Keyword indexes with at least this many chunks are scored on the GPU
+    # when CuPy and a device are available
+    GPU_MIN_CHUNKS = 1_000_000
+    
+    def __init__(
+        self,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        index_directory: Optional[str] = None
+    ):
+        """
+        Args:
+            embedding_model: SentenceTransformer model name
+            index_directory: Directory the keyword index is saved to and
+                memory-mapped from on start-up, or None to keep it in memory
+        """
         self.embedding_model = SentenceTransformer(embedding_model)
-        self.collection = None
-        self.keyword_index = defaultdict(set)  # word -> set of chunk_ids
-        
-    def _build_keyword_index(self, chunk_id: str, text: str):
-        """Build inverted index for keyword search"""
-        words = set(text.lower().split())
-        for word in words:
-            if len(word) > 2:  # Filter very short words
-                self.keyword_index[word].add(chunk_id)
-    
-    def _keyword_search(self, query: str, top_k: int = 20) -> Dict[str, float]:
-        """BM25-style keyword matching"""
-        query_words = set(query.lower().split())
-        scores = defaultdict(float)
-        
-        for word in query_words:
-            if word in self.keyword_index:
-                # Simple scoring: presence bonus + IDF approximation
-                idf = np.log(1 + len(self.keyword_index) / (1 + len(self.keyword_index[word])))
-                for chunk_id in self.keyword_index[word]:
-                    scores[chunk_id] += idf
+        self.index_directory = index_directory
+        self.backend = None
+        
+        # Keyword index: (term, chunk, count) triplets are accumulated per
+        # ingest batch; flush() turns them into a |V| x |C| CSR matrix of
+        # precomputed BM25 term scores
+        self.vocab: Dict[str, int] = {}  # term -> row
+        self.chunk_ids: List[str] = []  # column -> chunk_id
+        self._columns: Dict[str, int] = {}  # chunk_id -> column
+        self._tf_terms: List[np.ndarray] = []
+        self._tf_chunks: List[np.ndarray] = []
+        self._tf_counts: List[np.ndarray] = []
+        self._doc_lengths: List[np.ndarray] = []
+        self.bm25 = None
+        self._bm25_gpu = None  # Device copy of the bm25 arrays
+        self._keyword_dirty = False  # Triplets added since the last flush
+        self._use_gpu = cp is not None
+        
+        # Retrieval results are dropped whenever documents are added; the
+        # generation keeps a retrieval that overlapped the write from
+        # caching its result. Query embeddings stay valid as long as the
+        # model does
+        self.result_cache = QueryCache(max_size=1000, ttl_seconds=300)
+        self._result_generation = 0
+        self.embedding_cache = QueryCache(max_size=256)
+        
+        if index_directory:
+            self._load_index()
+    
+    def _tokenize(self, text: str) -> List[str]:
+        """Lowercased word tokens, very short words filtered out"""
+        return [w for w in self._TOKEN_RE.findall(text.lower()) if len(w) > 2]
+    
+    def _build_keyword_index_batch(self, chunk_ids: List[str], texts: List[str]):
+        """
+        Accumulate term counts of a batch of chunks for the keyword index
+        
+        All tokens of the batch are deduplicated with one np.unique and
+        counted with one sparse COO -> CSR conversion, so per-token work
+        stays in NumPy. Like the vector backends, chunk ids that are already
+        indexed are skipped, so re-ingesting a document changes nothing.
+        """
+        first_column = len(self.chunk_ids)
+        new = []
+        for i, chunk_id in enumerate(chunk_ids):
+            if chunk_id not in self._columns:
+                self._columns[chunk_id] = len(self.chunk_ids)
+                self.chunk_ids.append(chunk_id)
+                new.append(i)
+        if not new:
+            return
+        texts = [texts[i] for i in new]
+        
+        tokens = [self._tokenize(text) for text in texts]
+        lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+        self._doc_lengths.append(lengths)
+        if not lengths.sum():
+            return
+        
+        words, inverse = np.unique(
+            np.array([w for t in tokens for w in t]), return_inverse=True
+        )
+        term_ids = np.fromiter(
+            (self.vocab.setdefault(w, len(self.vocab)) for w in words.tolist()),
+            dtype=np.int64, count=len(words)
+        )
+        columns = np.repeat(np.arange(len(texts)), lengths)
+        
+        tf = sparse.coo_matrix(
+            (np.ones(len(inverse), dtype=np.float32), (term_ids[inverse], columns)),
+            shape=(len(self.vocab), len(texts))
+        ).tocsr().tocoo()  # sums duplicate (term, chunk) entries
+        
+        self._tf_terms.append(tf.row)
+        self._tf_chunks.append(tf.col + first_column)
+        self._tf_counts.append(tf.data)
+    
+    def _finalize_index(self):
+        """
+        Precompute BM25 scores into a CSR matrix
+        
+        Entry (t, d) holds IDF(t) * TF / (TF + k1 * (1 - b + b * |d| / avgdl)),
+        so scoring a query is a row gather and a column sum.
+        """
+        shape = (len(self.vocab), len(self.chunk_ids))
+        
+        # Keep one array per field so later batches concatenate onto it
+        self._tf_counts = [np.concatenate(self._tf_counts or [np.empty(0, dtype=np.float32)])]
+        self._tf_terms = [np.concatenate(self._tf_terms or [np.empty(0, dtype=np.int64)])]
+        self._tf_chunks = [np.concatenate(self._tf_chunks or [np.empty(0, dtype=np.int64)])]
+        self._doc_lengths = [np.concatenate(self._doc_lengths or [np.empty(0, dtype=np.int64)])]
+        
+        tf = sparse.csr_matrix(
+            (self._tf_counts[0], (self._tf_terms[0], self._tf_chunks[0])),
+            shape=shape
+        )
+        
+        n = shape[1]
+        df = np.diff(tf.indptr)
+        idf = np.log((n - df + 0.5) / (df + 0.5) + 1).astype(np.float32)
+        
+        doc_lengths = self._doc_lengths[0].astype(np.float32)
+        avgdl = max(float(doc_lengths.mean()), 1.0) if n else 1.0
+        norm = self.K1 * (1 - self.B + self.B * doc_lengths / avgdl)
+        
+        rows = np.repeat(np.arange(shape[0]), df)
+        data = idf[rows] * tf.data / (tf.data + norm[tf.indices])
+        self.bm25 = sparse.csr_matrix((data, tf.indices, tf.indptr), shape=shape)
+        self._bm25_gpu = None
+    
+    def _save_index(self):
+        """
+        Write the keyword index as plain .npy arrays
+        
+        Each file is written next to its final name and swapped in with
+        os.replace, so readers holding a memory map of the old file keep
+        a consistent view.
+        """
+        if not self.index_directory:
+            return
+        os.makedirs(self.index_directory, exist_ok=True)
+        
+        arrays = {
+            'bm25_data': self.bm25.data,
+            'bm25_indices': self.bm25.indices,
+            'bm25_indptr': self.bm25.indptr,
+            'tf_terms': self._tf_terms[0],
+            'tf_chunks': self._tf_chunks[0],
+            'tf_counts': self._tf_counts[0],
+            'doc_lengths': self._doc_lengths[0],
+            # dict order is row order
+            'vocab': np.array(list(self.vocab), dtype=str),
+            'chunk_ids': np.array(self.chunk_ids, dtype=str)
+        }
+        for name in self._INDEX_ARRAYS:
+            path = os.path.join(self.index_directory, f'{name}.npy')
+            with open(f'{path}.tmp', 'wb') as f:
+                np.save(f, arrays[name], allow_pickle=False)
+            os.replace(f'{path}.tmp', path)
+    
+    def _load_index(self):
+        """
+        Memory-map a saved keyword index
+        
+        Start-up cost is one pass over the vocabulary and chunk ids; the
+        score arrays are paged in by the OS as queries touch their rows.
+        """
+        try:
+            arrays = {
+                name: np.load(
+                    os.path.join(self.index_directory, f'{name}.npy'),
+                    mmap_mode='r', allow_pickle=False
+                )
+                for name in self._INDEX_ARRAYS
+            }
+        except FileNotFoundError:
+            return
+        
+        vocab = arrays['vocab'].tolist()
+        chunk_ids = arrays['chunk_ids'].tolist()
+        if (len(arrays['bm25_indptr']) != len(vocab) + 1
+                or len(arrays['doc_lengths']) != len(chunk_ids)):
+            print(f"Ignoring inconsistent keyword index in {self.index_directory}")
+            return
+        
+        self.vocab = {term: row for row, term in enumerate(vocab)}
+        self.chunk_ids = chunk_ids
+        self._columns = {chunk_id: column for column, chunk_id in enumerate(chunk_ids)}
+        self._tf_terms = [arrays['tf_terms']]
+        self._tf_chunks = [arrays['tf_chunks']]
+        self._tf_counts = [arrays['tf_counts']]
+        self._doc_lengths = [arrays['doc_lengths']]
+        self.bm25 = sparse.csr_matrix(
+            (arrays['bm25_data'], arrays['bm25_indices'], arrays['bm25_indptr']),
+            shape=(len(vocab), len(chunk_ids))
+        )
+        self._bm25_gpu = None
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query into a unit-length vector (memoized per query text)"""
+        key = QueryCache.key(query)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.embedding_model.encode(
+                [query], convert_to_numpy=True, normalize_embeddings=True
+            )[0]
+            embedding.setflags(write=False)
+            self.embedding_cache.put(key, embedding)
+        return embedding
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """embed_query for several queries, encoding the uncached ones together"""
+        keys = [QueryCache.key(query) for query in queries]
+        cached = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            encoded = self.embedding_model.encode(
+                [queries[i] for i in missing],
+                convert_to_numpy=True, normalize_embeddings=True
+            )
+            for i, embedding in zip(missing, encoded):
+                embedding.setflags(write=False)
+                self.embedding_cache.put(keys[i], embedding)
+                cached[i] = embedding
+        return np.stack(cached)
+    
+    def _keyword_search(self, query: str, top_k: int = 20) -> Tuple[List[str], np.ndarray]:
+        """
+        BM25 keyword matching
+        
+        Returns:
+            Chunk ids and their scores normalized to a maximum of 1,
+            best first
+        """
+        empty = ([], np.empty(0, dtype=np.float32))
+        if self.bm25 is None:
+            return empty
+        
+        # Terms first seen since the last flush have no scores yet
+        term_ids = [self.vocab[w] for w in set(self._tokenize(query)) if w in self.vocab]
+        term_ids = [t for t in term_ids if t < self.bm25.shape[0]]
+        if not term_ids:
+            return empty
+        
+        if self._gpu_index() is not None:
+            top, top_scores = self._keyword_top_k_gpu(term_ids, top_k)
+        else:
+            if _bm25_scores_native is not None:
+                bm25 = self.bm25
+                scores = _bm25_scores_native(
+                    np.asarray(term_ids, dtype=np.int64),
+                    bm25.data, bm25.indices, bm25.indptr, bm25.shape[1]
+                )
+            else:
+                scores = np.asarray(self.bm25[term_ids].sum(axis=0)).ravel()
+            top, top_scores = self._top_k(np, scores, top_k)
+        
+        if not len(top):
+            return empty
         
         # Normalize scores
-        if scores:
-            max_score = max(scores.values())
-            scores = {k: v/max_score for k, v in scores.items()}
+        return [self.chunk_ids[i] for i in top], top_scores / top_scores[0]
+    
+    @staticmethod
+    def _top_k(xp, scores, top_k: int):
+        """Indices and values of the top_k nonzero scores, best first (xp: numpy or cupy)"""
+        k = min(top_k, int(xp.count_nonzero(scores)))
+        if k == 0:
+            return xp.empty(0, dtype=np.int64), scores[:0]
+        
+        top = xp.argpartition(-scores, k - 1)[:k]
+        top = top[xp.argsort(-scores[top])]
+        return top, scores[top]
+    
+    def _gpu_index(self):
+        """Device copies of the bm25 CSR arrays, or None to score on the CPU"""
+        if not self._use_gpu or self.bm25.shape[1] < self.GPU_MIN_CHUNKS:
+            return None
+        
+        if self._bm25_gpu is None:
+            try:
+                self._bm25_gpu = tuple(
+                    cp.asarray(a) for a in (self.bm25.data, self.bm25.indices)
+                )
+            except Exception as e:  # CuPy without a usable device
+                print(f"GPU keyword scoring unavailable, using CPU: {e}")
+                self._use_gpu = False
+                return None
+        return self._bm25_gpu
+    
+    def _keyword_top_k_gpu(self, term_ids: List[int], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score the query terms on the GPU
+        
+        The posting ranges come from the host indptr, so the device only
+        gathers the query's postings, scatter-adds them into a dense score
+        vector and selects the top k; just k scores are copied back.
+        """
+        data, indices = self._gpu_index()
+        indptr = self.bm25.indptr
+        positions = cp.concatenate([
+            cp.arange(indptr[t], indptr[t + 1], dtype=cp.int64) for t in term_ids
+        ])
         
-        # Return top-k
-        sorted_results = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
-        return dict(sorted_results)
+        scores = cp.zeros(self.bm25.shape[1], dtype=cp.float32)
+        cupyx.scatter_add(scores, indices[positions], data[positions])
+        
+        top, top_scores = self._top_k(cp, scores, top_k)
+        return cp.asnumpy(top), cp.asnumpy(top_scores)
     
-    def add_documents(self, chunks: List[Tuple[str, ChunkMetadata]], collection):
-        """Add chunked documents to vector store and keyword index"""
-        self.collection = collection
+    def add_documents(
+        self,
+        chunks: List[Tuple[str, ChunkMetadata]],
+        backend,
+        batch_size: int = 200
+    ):
+        """
+        Add chunked documents to vector store and keyword index
+        
+        Chunks are embedded and written to the vector backend in batches
+        of batch_size, which keeps each index insert call bounded on large
+        ingests and lets embedding overlap with the previous insert. Their
+        keyword scores are only computed by the next flush().
+        """
+        self.backend = backend
         
         texts = []
         metadatas = []
@@ -231,16 +594,59 @@ class HybridRetriever:
                 'char_end': metadata.char_end
             })
             ids.append(metadata.chunk_id)
-            
-            # Build keyword index
-            self._build_keyword_index(metadata.chunk_id, text)
-        
-        # Add to vector store
-        self.collection.add(
-            documents=texts,
-            metadatas=metadatas,
-            ids=ids
-        )
+        
+        # Build keyword index
+        self._build_keyword_index_batch(ids, texts)
+        self._keyword_dirty = True
+        
+        # Embed here rather than through Chroma's embedding function:
+        # encode() sorts texts by length so each mini-batch is padded
+        # only to its own longest text. Batches are embedded while the
+        # previous one is written by a single insert thread, so the
+        # model and the vector store work at the same time.
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                embeddings = self.embedding_model.encode(
+                    texts[start:end],
+                    batch_size=64,
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+                if pending is not None:
+                    pending.result()  # At most one batch in flight
+                pending = writer.submit(
+                    self.backend.add,
+                    ids=ids[start:end],
+                    embeddings=embeddings,
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end]
+                )
+            if pending is not None:
+                pending.result()
+        
+        self._invalidate_results()
+    
+    def _invalidate_results(self):
+        """Drop cached results once the indexes have changed"""
+        self._result_generation += 1
+        self.result_cache.clear()
+    
+    def flush(self):
+        """
+        Score and save the chunks added since the last flush
+        
+        Rebuilding the BM25 matrix touches every chunk, so bulk ingests
+        add all their batches first and flush once.
+        """
+        if not self._keyword_dirty:
+            return
+        self._finalize_index()
+        self._save_index()
+        self._keyword_dirty = False
+        self._invalidate_results()
     
     def retrieve(
         self, 
@@ -262,69 +668,141 @@ class HybridRetriever:
             List of retrieved chunks with metadata and metrics
         """
         start_time = time.time()
+        generation = self._result_generation
         
-        # Dense retrieval (vector similarity)
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=min(top_k * 2, 20)  # Get more for reranking
-        )
-        
-        dense_scores = {}
-        for i, (doc_id, distance) in enumerate(zip(results['ids'][0], results['distances'][0])):
-            # Convert distance to similarity (ChromaDB uses cosine distance)
-            similarity = 1 - distance
-            dense_scores[doc_id] = similarity
-        
-        # Keyword retrieval
-        keyword_scores = self._keyword_search(query, top_k=top_k * 2)
+        cache_key = QueryCache.key(query, top_k, hybrid_alpha, min_similarity)
+        retrieved_chunks = self.result_cache.get(cache_key)
+        if retrieved_chunks is None:
+            retrieved_chunks = self._retrieve_chunks(query, top_k, hybrid_alpha, min_similarity)
+            if generation == self._result_generation:
+                self.result_cache.put(cache_key, retrieved_chunks)
         
-        # Hybrid fusion
-        all_doc_ids = set(dense_scores.keys()) | set(keyword_scores.keys())
-        hybrid_scores = {}
-        
-        for doc_id in all_doc_ids:
-            dense_score = dense_scores.get(doc_id, 0.0)
-            keyword_score = keyword_scores.get(doc_id, 0.0)
-            hybrid_scores[doc_id] = (hybrid_alpha * dense_score + 
-                                    (1 - hybrid_alpha) * keyword_score)
+        query_time = time.time() - start_time
         
-        # Filter by minimum similarity and sort
-        filtered_scores = {k: v for k, v in hybrid_scores.items() 
-                          if v >= min_similarity}
-        sorted_results = sorted(filtered_scores.items(), 
-                               key=lambda x: x[1], reverse=True)[:top_k]
+        return retrieved_chunks, self._metrics(retrieved_chunks, query_time)
+    
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        hybrid_alpha: float = 0.7,
+        min_similarity: float = 0.3
+    ) -> List[Tuple[List[Dict], RetrievalMetrics]]:
+        """
+        retrieve() for several queries at once.
         
-        # Retrieve full documents
-        retrieved_chunks = []
-        if sorted_results:
-            chunk_ids = [doc_id for doc_id, _ in sorted_results]
-            full_results = self.collection.get(
-                ids=chunk_ids,
-                include=['documents', 'metadatas']
+        Uncached queries are embedded in one encode call and searched in
+        one backend query; their keyword searches run on a thread pool.
+        Each query's metrics report an even share of the batch time.
+        """
+        start_time = time.time()
+        generation = self._result_generation
+        
+        cache_keys = [
+            QueryCache.key(query, top_k, hybrid_alpha, min_similarity) for query in queries
+        ]
+        results = [self.result_cache.get(key) for key in cache_keys]
+        missing = [i for i, chunks in enumerate(results) if chunks is None]
+        
+        if missing:
+            missing_queries = [queries[i] for i in missing]
+            dense_results = self.backend.query_batch(
+                self.embed_queries(missing_queries),
+                n_results=min(top_k * 2, 20)
             )
-            
-            for i, (doc_id, score) in enumerate(sorted_results):
-                retrieved_chunks.append({
-                    'chunk_id': doc_id,
-                    'text': full_results['documents'][i],
-                    'metadata': full_results['metadatas'][i],
-                    'similarity_score': score,
-                    'rank': i + 1
-                })
-        
-        query_time = time.time() - start_time
-        
-        # Calculate metrics
+            with ThreadPoolExecutor(max_workers=min(4, len(missing))) as executor:
+                keyword_results = list(executor.map(
+                    lambda query: self._keyword_search(query, top_k=top_k * 2),
+                    missing_queries
+                ))
+            for i, dense, keyword in zip(missing, dense_results, keyword_results):
+                results[i] = self._fuse(dense, keyword, top_k, hybrid_alpha, min_similarity)
+                if generation == self._result_generation:
+                    self.result_cache.put(cache_keys[i], results[i])
+        
+        query_time = (time.time() - start_time) / max(len(queries), 1)
+        
+        return [(chunks, self._metrics(chunks, query_time)) for chunks in results]
+    
+    @staticmethod
+    def _metrics(retrieved_chunks: List[Dict], query_time: float) -> RetrievalMetrics:
         similarity_scores = [chunk['similarity_score'] for chunk in retrieved_chunks]
-        metrics = RetrievalMetrics(
+        return RetrievalMetrics(
             query_time=query_time,
             num_chunks_retrieved=len(retrieved_chunks),
             avg_similarity_score=np.mean(similarity_scores) if similarity_scores else 0.0,
             max_similarity_score=max(similarity_scores) if similarity_scores else 0.0,
             min_similarity_score=min(similarity_scores) if similarity_scores else 0.0
         )
+    
+    def _retrieve_chunks(
+        self,
+        query: str,
+        top_k: int,
+        hybrid_alpha: float,
+        min_similarity: float
+    ) -> List[Dict]:
+        """Run dense and keyword retrieval and fuse the results"""
+        # Dense retrieval (vector similarity)
+        dense = self.backend.query(
+            self.embed_query(query),
+            n_results=min(top_k * 2, 20)  # Get more for reranking
+        )
+        
+        # Keyword retrieval
+        keyword = self._keyword_search(query, top_k=top_k * 2)
+        
+        return self._fuse(dense, keyword, top_k, hybrid_alpha, min_similarity)
+    
+    def _fuse(
+        self,
+        dense: Tuple[List[str], np.ndarray, List[str], List[Dict]],
+        keyword: Tuple[List[str], np.ndarray],
+        top_k: int,
+        hybrid_alpha: float,
+        min_similarity: float
+    ) -> List[Dict]:
+        """Combine one query's dense and keyword hits into ranked chunks"""
+        dense_ids, dense_scores, dense_documents, dense_metadatas = dense
+        keyword_ids, keyword_scores = keyword
+        
+        # Hybrid fusion: one score slot per distinct chunk id
+        candidate_ids, slots = np.unique(
+            np.array(dense_ids + keyword_ids, dtype=str), return_inverse=True
+        )
+        hybrid_scores = np.zeros(len(candidate_ids))
+        np.add.at(hybrid_scores, slots[:len(dense_ids)], hybrid_alpha * dense_scores)
+        np.add.at(hybrid_scores, slots[len(dense_ids):], (1 - hybrid_alpha) * keyword_scores)
+        
+        # Filter by minimum similarity and take the top k
+        passing = np.flatnonzero(hybrid_scores >= min_similarity)
+        if len(passing) > top_k:
+            passing = passing[np.argpartition(-hybrid_scores[passing], top_k - 1)[:top_k]]
+        passing = passing[np.argsort(-hybrid_scores[passing])]
+        sorted_results = [(str(candidate_ids[i]), float(hybrid_scores[i])) for i in passing]
+        
+        # Dense hits came back with their documents; only keyword-only
+        # matches need a second round trip
+        documents_by_id = dict(zip(dense_ids, zip(dense_documents, dense_metadatas)))
+        missing_ids = [doc_id for doc_id, _ in sorted_results if doc_id not in documents_by_id]
+        if missing_ids:
+            found_ids, found_documents, found_metadatas = self.backend.get(missing_ids)
+            documents_by_id.update(zip(found_ids, zip(found_documents, found_metadatas)))
         
-        return retrieved_chunks, metrics
+        retrieved_chunks = []
+        for doc_id, score in sorted_results:
+            if doc_id not in documents_by_id:
+                continue  # Indexed for keywords but gone from the vector store
+            text, metadata = documents_by_id[doc_id]
+            retrieved_chunks.append({
+                'chunk_id': doc_id,
+                'text': text,
+                'metadata': metadata,
+                'similarity_score': score,
+                'rank': len(retrieved_chunks) + 1
+            })
+        
+        return retrieved_chunks
 
 
 class AdvancedRAGSystem:
@@ -332,56 +810,106 @@ class AdvancedRAGSystem:
     Complete RAG system with semantic chunking and hybrid retrieval.
     """
     
+    # Below this many characters, process start-up costs more than chunking
+    PARALLEL_INGEST_MIN_CHARS = 200_000
+    
+    # Number of most recent queries kept for get_metrics_summary
+    METRICS_HISTORY_SIZE = 10_000
+    
     def __init__(
         self,
         embedding_model: str = "all-MiniLM-L6-v2",
-        persist_directory: str = "./chroma_db"
+        persist_directory: str = "./chroma_db",
+        ingest_workers: Optional[int] = None,
+        vector_backend: Optional[str] = None,
+        index_type: Optional[str] = None
     ):
+        """
+        Args:
+            embedding_model: SentenceTransformer model name
+            persist_directory: Directory holding the vector store
+            ingest_workers: Chunking processes (RAG_INGEST_WORKERS)
+            vector_backend: "chroma" or "faiss" (RAG_VECTOR_BACKEND, default chroma)
+            index_type: FAISS index, "hnsw" or "ivfpq" (RAG_FAISS_INDEX, default hnsw)
+        """
         self.chunker = SemanticChunker()
-        self.retriever = HybridRetriever(embedding_model)
-        
-        # Initialize ChromaDB
-        self.client = chromadb.Client(Settings(
-            persist_directory=persist_directory,
-            anonymized_telemetry=False
-        ))
+        self.ingest_workers = ingest_workers or int(
+            os.environ.get("RAG_INGEST_WORKERS", os.cpu_count() or 1)
+        )
+        self.retriever = HybridRetriever(
+            embedding_model,
+            index_directory=os.path.join(persist_directory, "keyword_index")
+        )
         
-        # Create or get collection
-        try:
-            self.collection = self.client.create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"}
-            )
-        except:
-            self.collection = self.client.get_collection(name="documents")
+        # Both backends persist to persist_directory, so every API worker
+        # opens the same store. FAISS avoids Chroma's slowdown on large
+        # collections.
+        self.vector_store = create_backend(
+            vector_backend or os.environ.get("RAG_VECTOR_BACKEND", "chroma"),
+            persist_directory,
+            embedding_dim=self.retriever.embedding_model.get_sentence_embedding_dimension(),
+            index_type=index_type or os.environ.get("RAG_FAISS_INDEX")
+        )
+        # A reopened store is searchable before this process ingests anything
+        self.retriever.backend = self.vector_store
         
-        self.metrics_history = []
+        # Ring buffer of (query_time, avg_similarity_score) per query
+        self._query_metrics = np.empty((self.METRICS_HISTORY_SIZE, 2), dtype=np.float64)
+        self._query_metrics_next = 0
+        self.total_queries = 0
     
-    def ingest_documents(self, documents: List[Dict[str, str]]):
+    def ingest_documents(self, documents: List[Dict[str, str]], flush: bool = True):
         """
         Ingest documents into the RAG system.
         
         Args:
             documents: List of dicts with 'id' and 'text' keys
+            flush: Whether to make the documents keyword-searchable and
+                persist them now; bulk ingests pass False for all but the
+                last batch, or call flush() themselves
         """
         all_chunks = []
         
-        for doc in documents:
-            doc_id = doc['id']
-            text = doc['text']
-            
-            # Chunk the document
-            chunks = self.chunker.chunk_text(text, doc_id)
+        for doc, chunks in zip(documents, self._chunk_documents(documents)):
             all_chunks.extend(chunks)
-            
-            print(f"Document {doc_id}: created {len(chunks)} chunks")
+            print(f"Document {doc['id']}: created {len(chunks)} chunks")
         
         # Add to retriever
-        self.retriever.add_documents(all_chunks, self.collection)
+        self.retriever.add_documents(all_chunks, self.vector_store)
+        if flush:
+            self.flush()
         print(f"\nTotal chunks ingested: {len(all_chunks)}")
         
         return len(all_chunks)
     
+    def flush(self):
+        """Finish pending ingests: score new keywords and persist the indexes"""
+        self.retriever.flush()
+        self.vector_store.flush()
+    
+    def _chunk_documents(
+        self, documents: List[Dict[str, str]]
+    ) -> List[List[Tuple[str, ChunkMetadata]]]:
+        """
+        Chunk documents, fanning out across processes for large batches.
+        
+        Chunking is pure Python and CPU-bound, so documents are spread over
+        a process pool (RAG_INGEST_WORKERS, default: all cores). Results keep
+        the input order.
+        """
+        texts = [doc['text'] for doc in documents]
+        doc_ids = [doc['id'] for doc in documents]
+        workers = min(self.ingest_workers, len(documents))
+        
+        if workers > 1 and sum(len(t) for t in texts) >= self.PARALLEL_INGEST_MIN_CHARS:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(
+                    self.chunker.chunk_text, texts, doc_ids,
+                    chunksize=max(1, len(documents) // (workers * 4))
+                ))
+        
+        return [self.chunker.chunk_text(text, doc_id) for text, doc_id in zip(texts, doc_ids)]
+    
     def query(
         self, 
         query: str, 
@@ -402,11 +930,11 @@ class AdvancedRAGSystem:
         chunks, metrics = self.retriever.retrieve(query, top_k=top_k)
         
         # Store metrics
-        self.metrics_history.append({
-            'query': query,
-            'timestamp': time.time(),
-            'metrics': metrics
-        })
+        self._query_metrics[self._query_metrics_next] = (
+            metrics.query_time, metrics.avg_similarity_score
+        )
+        self._query_metrics_next = (self._query_metrics_next + 1) % self.METRICS_HISTORY_SIZE
+        self.total_queries += 1
         
         result = {
             'query': query,
@@ -425,19 +953,25 @@ class AdvancedRAGSystem:
         
         return result
     
+    def get_index_info(self) -> Dict:
+        """Describe the vector index backing dense retrieval"""
+        info = self.vector_store.info()
+        info['keyword_terms'] = len(self.retriever.vocab)
+        return info
+    
     def get_metrics_summary(self) -> Dict:
-        """Get summary statistics of all queries"""
-        if not self.metrics_history:
+        """Get summary statistics of the most recent METRICS_HISTORY_SIZE queries"""
+        if not self.total_queries:
             return {}
         
-        query_times = [m['metrics'].query_time for m in self.metrics_history]
-        avg_scores = [m['metrics'].avg_similarity_score for m in self.metrics_history]
+        window = self._query_metrics[:min(self.total_queries, self.METRICS_HISTORY_SIZE)]
+        query_times = window[:, 0]
         
         return {
-            'total_queries': len(self.metrics_history),
-            'avg_query_time_ms': np.mean(query_times) * 1000,
+            'total_queries': self.total_queries,
+            'avg_query_time_ms': query_times.mean() * 1000,
             'median_query_time_ms': np.median(query_times) * 1000,
-            'avg_similarity_score': np.mean(avg_scores),
+            'avg_similarity_score': window[:, 1].mean(),
             'p95_query_time_ms': np.percentile(query_times, 95) * 1000
         }
 
@@ -2,8 +2,9 @@
 Rate Limiter Module
 Implements token bucket rate limiting for API requests
 """
+import threading
 import time
-from typing import Dict
+from typing import Dict, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,79 +13,73 @@ logger = logging.getLogger(__name__)
 class RateLimiter:
     """
     Token bucket rate limiter for API endpoints
-    
-    Prevents abuse and ensures fair usage
+
+    Prevents abuse and ensures fair usage. Each user's bucket holds up to
+    max_requests tokens and refills continuously at
+    max_requests / window_seconds tokens per second; a request spends one.
     """
-    
+
     def __init__(self, max_requests: int = 10, window_seconds: int = 60):
         """
         Initialize rate limiter
-        
+
         Args:
             max_requests: Maximum requests allowed per window
             window_seconds: Time window in seconds
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: Dict[str, list] = {}  # user_id -> list of timestamps
-        
+        self.refill_rate = max_requests / window_seconds  # tokens per second
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # user_id -> (tokens, last_refill)
+        self._lock = threading.Lock()
+
         logger.info(f"RateLimiter initialized: {max_requests} requests per {window_seconds} seconds")
-    
+
+    def _refill(self, user_id: str, now: float) -> float:
+        """Tokens available to user at time now"""
+        tokens, last_refill = self.buckets.get(user_id, (self.max_requests, now))
+        return min(self.max_requests, tokens + (now - last_refill) * self.refill_rate)
+
     def allow_request(self, user_id: str) -> bool:
         """
         Check if request is allowed for user
-        
+
         Args:
             user_id: Unique user identifier
-        
+
         Returns:
             True if request is allowed, False if rate limit exceeded
         """
-        current_time = time.time()
-        
-        # Initialize user if not exists
-        if user_id not in self.requests:
-            self.requests[user_id] = []
-        
-        # Clean old requests outside window
-        cutoff_time = current_time - self.window_seconds
-        self.requests[user_id] = [
-            timestamp for timestamp in self.requests[user_id]
-            if timestamp > cutoff_time
-        ]
-        
-        # Check if under limit
-        if len(self.requests[user_id]) < self.max_requests:
-            self.requests[user_id].append(current_time)
-            logger.debug(f"Request allowed for {user_id}. Count: {len(self.requests[user_id])}/{self.max_requests}")
-            return True
+        now = time.monotonic()
+
+        with self._lock:
+            tokens = self._refill(user_id, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[user_id] = (tokens, now)
+
+        if allowed:
+            logger.debug(f"Request allowed for {user_id}. Tokens left: {tokens:.2f}/{self.max_requests}")
         else:
             logger.warning(f"Rate limit exceeded for {user_id}")
-            return False
-    
+        return allowed
+
     def get_remaining_requests(self, user_id: str) -> int:
         """
         Get remaining requests for user in current window
-        
+
         Args:
             user_id: User identifier
-        
+
         Returns:
             Number of remaining requests
         """
-        if user_id not in self.requests:
-            return self.max_requests
-        
-        current_time = time.time()
-        cutoff_time = current_time - self.window_seconds
-        
-        # Count recent requests
-        recent_requests = sum(1 for ts in self.requests[user_id] if ts > cutoff_time)
-        
-        return max(0, self.max_requests - recent_requests)
-    
+        with self._lock:
+            return int(self._refill(user_id, time.monotonic()))
+
     def reset_user(self, user_id: str):
         """Reset rate limit for a user"""
-        if user_id in self.requests:
-            del self.requests[user_id]
-            logger.info(f"Rate limit reset for {user_id}")
+        with self._lock:
+            if self.buckets.pop(user_id, None) is not None:
+                logger.info(f"Rate limit reset for {user_id}")
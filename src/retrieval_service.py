@@ -71,6 +71,37 @@ class RetrievalService:
             logger.error(f"Error during retrieval: {str(e)}")
             raise
     
+    def retrieve_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Retrieve relevant chunks for several queries at once
+        
+        The queries are embedded together and searched with one index call.
+        
+        Args:
+            queries: User query strings
+            top_k: Number of top results to retrieve per query
+        
+        Returns:
+            One list of relevant chunks per query, in order
+        """
+        if not queries:
+            return []
+        
+        try:
+            logger.info(f"Retrieving chunks for {len(queries)} queries (top_k={top_k})")
+            
+            query_embeddings = self.embedding_service.embed_queries(queries)
+            batch_results = self.vector_store.search_batch(query_embeddings, top_k=top_k)
+            
+            return [
+                [result for result in results if result['score'] >= self.similarity_threshold]
+                for results in batch_results
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error during batch retrieval: {str(e)}")
+            raise
+    
     def set_similarity_threshold(self, threshold: float):
         """
         Set the minimum similarity threshold
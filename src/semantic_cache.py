@@ -0,0 +1,68 @@
+"""
+Semantic Cache Module
+Reuses query results for near-duplicate questions by embedding similarity
+"""
+from typing import Any, List, Optional, Tuple
+import numpy as np
+import threading
+import time
+
+
+class SemanticQueryCache:
+    """
+    Reuses query results for near-duplicate questions.
+    
+    Embeddings of recent queries are kept in a fixed-size ring. A new query
+    whose cosine similarity with a cached one reaches the threshold, asked
+    with the same parameters within the TTL, gets the cached result.
+    Safe to share between threads.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_size: int = 1024,
+        ttl_seconds: float = 300.0
+    ):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.clear()
+    
+    def clear(self):
+        """Drop all cached results (e.g. after new documents are ingested)"""
+        with self._lock:
+            self._vectors = None
+            self._entries: List[Optional[Tuple[tuple, float, Any]]] = [None] * self.max_size
+            self._next = 0
+            self._size = 0
+    
+    def get(self, query_embedding: np.ndarray, params: tuple) -> Optional[Any]:
+        """Return the cached result of the most similar fresh query, if any"""
+        with self._lock:
+            if self._size == 0:
+                return None
+            
+            sims = self._vectors[:self._size] @ query_embedding
+            now = time.time()
+            
+            for idx in np.argsort(-sims):
+                if sims[idx] < self.threshold:
+                    break
+                entry_params, timestamp, result = self._entries[idx]
+                if entry_params == params and now - timestamp <= self.ttl_seconds:
+                    return result
+            
+            return None
+    
+    def put(self, query_embedding: np.ndarray, params: tuple, result: Any):
+        """Cache a result, overwriting the oldest entry when full"""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(query_embedding)), dtype=np.float32)
+            
+            self._vectors[self._next] = query_embedding
+            self._entries[self._next] = (params, time.time(), result)
+            self._next = (self._next + 1) % self.max_size
+            self._size = min(self._size + 1, self.max_size)
@@ -0,0 +1,87 @@
+"""
+Unit tests for the on-disk chunk store
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.chunk_store import ChunkStore
+
+
+def _chunk(i: int) -> dict:
+    return {'text': f"chunk {i} text é", 'metadata': {'chunk_id': i, 'filename': 'doc.txt'}}
+
+
+class TestChunkStore(unittest.TestCase):
+    """Test pending, flushed and removed chunks"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ChunkStore(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_pending_and_flushed_lookups(self):
+        """Test that chunks are found before and after a flush"""
+        self.store.add([0, 1], [_chunk(0), _chunk(1)])
+        self.store.flush()
+        self.store.add([2], [_chunk(2)])
+
+        found = self.store.get_many(np.array([2, 0, 7, 1], dtype=np.int64))
+        self.assertEqual(found, [_chunk(2), _chunk(0), None, _chunk(1)])
+        self.assertEqual(len(self.store), 3)
+
+    def test_reload_after_flush(self):
+        """Test that a fresh store memory-maps the flushed chunks"""
+        self.store.add([0, 1, 2], [_chunk(0), _chunk(1), _chunk(2)])
+        self.store.flush()
+        self.store.add([3], [_chunk(3)])
+        self.store.flush()
+
+        reloaded = ChunkStore(self.temp_dir)
+        self.assertTrue(reloaded.load())
+        self.assertEqual(len(reloaded), 4)
+        self.assertEqual(reloaded.get(3), _chunk(3))
+
+    def test_remove_persists(self):
+        """Test that removed chunks stay removed across a reload"""
+        self.store.add([0, 1], [_chunk(0), _chunk(1)])
+        self.store.flush()
+        self.store.add([2], [_chunk(2)])
+        self.store.remove([0, 2, 9])
+        self.store.flush()
+
+        reloaded = ChunkStore(self.temp_dir)
+        reloaded.load()
+        self.assertEqual(len(reloaded), 1)
+        self.assertIsNone(reloaded.get(0))
+        self.assertIsNone(reloaded.get(2))
+        self.assertEqual(reloaded.get(1), _chunk(1))
+
+    def test_interrupted_flush_bytes_are_dropped(self):
+        """Test that blob bytes written past the last row are overwritten"""
+        self.store.add([0], [_chunk(0)])
+        self.store.flush()
+        with open(os.path.join(self.temp_dir, "chunk_texts.bin"), 'ab') as f:
+            f.write(b"garbage from an interrupted flush")
+
+        reloaded = ChunkStore(self.temp_dir)
+        reloaded.load()
+        reloaded.add([1], [_chunk(1)])
+        reloaded.flush()
+
+        final = ChunkStore(self.temp_dir)
+        final.load()
+        self.assertEqual(final.get_many(np.array([0, 1], dtype=np.int64)), [_chunk(0), _chunk(1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
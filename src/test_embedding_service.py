@@ -0,0 +1,65 @@
+"""
+Unit tests for the embedding service
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.embedding_service import EmbeddingService
+
+
+class TestEmbeddingService(unittest.TestCase):
+    """Test the local hashing embedder"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, "embeddings.db")
+        self.service = EmbeddingService(cache_path=self.cache_path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_import_does_not_load_torch(self):
+        """Importing the service must stay lightweight"""
+        code = "import sys, src.embedding_service; sys.exit('torch' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR)
+        self.assertEqual(result.returncode, 0, "torch was imported")
+    
+    def test_embeddings_are_normalized(self):
+        """Test shape and unit length of chunk embeddings"""
+        embeddings = self.service.embed_chunks(["Machine learning", "Deep neural networks"])
+        
+        self.assertEqual(embeddings.shape, (2, self.service.get_embedding_dimension()))
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+    
+    def test_related_text_scores_higher(self):
+        """Test that shared vocabulary yields higher similarity"""
+        docs = self.service.embed_chunks([
+            "Python is a programming language.",
+            "The weather is sunny today."
+        ])
+        query = self.service.embed_query("What programming language is Python?")
+        
+        scores = docs @ query
+        self.assertGreater(scores[0], scores[1])
+    
+    def test_cache_round_trip(self):
+        """Test that a fresh service reads vectors back from the disk cache"""
+        texts = ["first chunk", "second chunk"]
+        expected = self.service.embed_chunks(texts)
+        
+        reloaded = EmbeddingService(cache_path=self.cache_path)
+        self.assertEqual(len(reloaded.cache.get_many([reloaded.cache.key(t) for t in texts])), 2)
+        np.testing.assert_array_equal(reloaded.embed_chunks(texts), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Unit tests for the background upload indexing of the FastAPI app
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+class TestIndexWorkers(unittest.TestCase):
+    """Test the upload queue drained by the indexing workers"""
+
+    @classmethod
+    def setUpClass(cls):
+        # src.main builds its services at import time; keep their files
+        # out of the working tree and the user's cache
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.cwd = os.getcwd()
+        os.chdir(cls.temp_dir)
+        os.environ.setdefault("RAG_EMBEDDING_CACHE", os.path.join(cls.temp_dir, "embeddings.db"))
+
+        from src import main
+        cls.main = main
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        shutil.rmtree(cls.temp_dir)
+
+    def setUp(self):
+        from src.embedding_service import EmbeddingService
+        from src.vector_store import VectorStore
+
+        self.store_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        self.main.embedding_service = EmbeddingService(
+            cache_path=os.path.join(self.store_dir, "embeddings.db")
+        )
+        self.main.vector_store = VectorStore(
+            embedding_dim=self.main.embedding_service.get_embedding_dimension(),
+            persist_dir=self.store_dir
+        )
+
+    def _upload(self, text: str, name: str) -> tuple:
+        path = os.path.join(self.store_dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return (name.split(".")[0], name, path, ".txt")
+
+    def _index(self, items):
+        """Queue items, wait until the workers have drained them, then stop the workers"""
+        async def run():
+            await self.main.start_index_workers()
+            for item in items:
+                await self.main.app.state.index_queue.put(item)
+            await self.main.app.state.index_queue.join()
+            await self.main.stop_index_workers()
+
+        asyncio.run(run())
+
+    def test_uploads_are_indexed(self):
+        """Test that queued uploads are indexed, cleaned up and invalidate cached answers"""
+        items = [
+            self._upload("Quantum computing uses qubits for computation. " * 5, "quantum.txt"),
+            self._upload("Classical computing uses bits for data storage. " * 5, "classical.txt"),
+            self._upload("The weather is sunny today with a light breeze. " * 5, "weather.txt")
+        ]
+        cache_key = self.main.QueryCache.key("What are qubits?", 3)
+        self.main.query_cache.put(cache_key, {"answer": "stale"})
+
+        self._index(items)
+
+        stats = self.main.vector_store.get_stats()
+        self.assertEqual(stats["documents"], 3)
+        self.assertGreaterEqual(stats["chunks"], 3)
+        self.assertTrue(all(not os.path.exists(path) for _, _, path, _ in items))
+        self.assertIsNone(self.main.query_cache.get(cache_key))
+
+        results = self.main.vector_store.search(
+            self.main.embedding_service.embed_query("qubits computation"), top_k=1
+        )
+        self.assertEqual(results[0]["metadata"]["filename"], "quantum.txt")
+
+    def test_failed_upload_does_not_block_batch(self):
+        """Test that a document failing extraction leaves the rest of its batch indexed"""
+        items = [
+            self._upload("Deep learning uses neural networks with many layers. " * 5, "deep.txt"),
+            ("missing", "missing.txt", os.path.join(self.store_dir, "missing.txt"), ".txt")
+        ]
+
+        self._index(items)
+
+        self.assertEqual(self.main.vector_store.get_stats()["documents"], 1)
+        self.assertEqual(self.main.app.state.index_queue.qsize(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
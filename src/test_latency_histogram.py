@@ -0,0 +1,92 @@
+"""
+Unit tests for the shared latency histogram
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+import uuid
+from multiprocessing import shared_memory
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.latency_histogram import LatencyHistogram
+
+
+def _observe_in_worker(shm_name: str, num_workers: int, observations: int, rows):
+    """Worker process body: claim a row, record observations, report the row"""
+    histogram = LatencyHistogram(shm_name=shm_name, num_workers=num_workers)
+    for _ in range(observations):
+        histogram.observe(1.0)
+    rows.put(histogram._row)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test bucketing and cross-process aggregation"""
+
+    def setUp(self):
+        self.shm_name = f"rag_test_{uuid.uuid4().hex[:12]}"
+
+    def tearDown(self):
+        try:
+            shm = shared_memory.SharedMemory(name=self.shm_name)
+        except FileNotFoundError:
+            pass
+        else:
+            shm.close()
+            shm.unlink()
+        lock_path = os.path.join(tempfile.gettempdir(), f"{self.shm_name}.lock")
+        if os.path.exists(lock_path):
+            os.unlink(lock_path)
+
+    def _run_worker(self, observations: int) -> int:
+        """Run one worker process to completion and return the row it claimed"""
+        rows = multiprocessing.Queue()
+        worker = multiprocessing.Process(
+            target=_observe_in_worker, args=(self.shm_name, 3, observations, rows)
+        )
+        worker.start()
+        row = rows.get(timeout=30)
+        worker.join(timeout=30)
+        self.assertEqual(worker.exitcode, 0)
+        return row
+
+    def test_local_percentiles(self):
+        """Test that observations land in the bucket bounding them"""
+        histogram = LatencyHistogram(num_buckets=8, base_ms=1.0)
+        for value_ms in (0.5, 1.5, 3.0, 100.0):
+            histogram.observe(value_ms)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['counts'][:3], [1, 1, 1])
+        self.assertEqual(snapshot['counts'][-1], 1)  # Overflow bucket
+        self.assertEqual(snapshot['p50_ms'], 2.0)
+
+    def test_workers_share_counts(self):
+        """Test that counts of every worker process are merged"""
+        histogram = LatencyHistogram(shm_name=self.shm_name, num_workers=3)
+        histogram.observe(1.0)
+
+        row = self._run_worker(observations=4)
+
+        self.assertNotEqual(row, histogram._row)
+        self.assertEqual(histogram.snapshot()['count'], 5)
+
+    def test_dead_worker_row_is_reused(self):
+        """Test that a new worker takes over the row of an exited one"""
+        histogram = LatencyHistogram(shm_name=self.shm_name, num_workers=3)
+
+        first = self._run_worker(observations=2)
+        second = self._run_worker(observations=3)
+
+        self.assertEqual(second, first)
+        # The reused row keeps the exited worker's counts
+        self.assertEqual(histogram.snapshot()['count'], 5)
+        self.assertEqual(histogram.snapshot()['workers'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
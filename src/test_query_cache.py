@@ -0,0 +1,77 @@
+"""
+Unit tests for the query result cache
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test keys, eviction, expiry and invalidation"""
+
+    def test_keys_include_parameters(self):
+        """Test that the same question with other parameters is another entry"""
+        cache = QueryCache()
+        cache.put(QueryCache.key("What is RAG?", 3), "three")
+
+        self.assertEqual(cache.get(QueryCache.key("What is RAG?", 3)), "three")
+        self.assertIsNone(cache.get(QueryCache.key("What is RAG?", 5)))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = QueryCache(max_size=2)
+        cache.put(b"a", 1)
+        cache.put(b"b", 2)
+        cache.get(b"a")
+        cache.put(b"c", 3)
+
+        self.assertEqual(cache.get(b"a"), 1)
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after ttl_seconds"""
+        cache = QueryCache(ttl_seconds=0.05)
+        cache.put(b"a", 1)
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get(b"a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_clear_during_concurrent_use(self):
+        """Test that clear() invalidates entries while other threads use the cache"""
+        cache = QueryCache(max_size=64)
+        errors = []
+
+        def churn(worker: int):
+            try:
+                for i in range(2000):
+                    key = bytes([worker, i % 100])
+                    cache.put(key, i)
+                    cache.get(key)
+            except Exception as e:
+                errors.append(repr(e))
+
+        threads = [threading.Thread(target=churn, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for _ in range(50):
+            cache.clear()
+        for thread in threads:
+            thread.join()
+        cache.clear()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get(bytes([0, 0])))
+
+
+if __name__ == '__main__':
+    unittest.main()
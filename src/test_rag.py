@@ -135,6 +135,20 @@ class TestAdvancedRAGSystem(unittest.TestCase):
                              chunks[1]['similarity_score'],
                              "Most relevant result should have highest score")
     
+    def test_query_after_restart(self):
+        """Test that a system reopened on the same directory answers queries"""
+        documents = [
+            {'id': 'doc1', 'text': 'Machine learning is a subset of artificial intelligence.'},
+            {'id': 'doc2', 'text': 'Deep learning uses neural networks with multiple layers.'}
+        ]
+        
+        self.rag.ingest_documents(documents)
+        reopened = AdvancedRAGSystem(persist_directory=self.temp_dir)
+        result = reopened.query("What is machine learning?", top_k=2)
+        
+        self.assertGreater(len(result['retrieved_chunks']), 0)
+        self.assertIn('machine learning', result['retrieved_chunks'][0]['text'].lower())
+    
     def test_top_k_parameter(self):
         """Test that top_k parameter works"""
         documents = [
@@ -175,6 +189,40 @@ class TestHybridRetrieval(unittest.TestCase):
         top_result = result['retrieved_chunks'][0]
         self.assertIn('quantum', top_result['text'].lower())
 
+    def test_reingest_is_idempotent(self):
+        """Test that ingesting the same documents again adds no keyword columns"""
+        documents = [
+            {'id': 'doc1', 'text': 'Quantum computing uses qubits for computation.'}
+        ]
+        
+        self.rag.ingest_documents(documents)
+        chunk_ids = list(self.rag.retriever.chunk_ids)
+        self.rag.ingest_documents(documents)
+        
+        self.assertEqual(self.rag.retriever.chunk_ids, chunk_ids)
+        self.assertEqual(self.rag.retriever.bm25.shape[1], len(chunk_ids))
+    
+    def test_batch_retrieval(self):
+        """Test that batched retrieval matches single-query retrieval"""
+        documents = [
+            {'id': 'doc1', 'text': 'Quantum computing uses qubits for computation.'},
+            {'id': 'doc2', 'text': 'Classical computing uses bits for data storage.'}
+        ]
+
+        self.rag.ingest_documents(documents)
+        queries = ["qubits", "data storage"]
+
+        batch = self.rag.retriever.retrieve_batch(queries, top_k=2)
+        self.assertEqual(len(batch), len(queries))
+
+        for query, (chunks, metrics) in zip(queries, batch):
+            self.rag.retriever.result_cache.clear()
+            single, _ = self.rag.retriever.retrieve(query, top_k=2)
+            self.assertEqual(
+                [c['chunk_id'] for c in chunks], [c['chunk_id'] for c in single]
+            )
+            self.assertEqual(metrics.num_chunks_retrieved, len(chunks))
+
 
 def run_tests():
     """Run all tests"""
@@ -0,0 +1,79 @@
+"""
+Unit tests for the retrieval service
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.embedding_cache import EmbeddingCache
+from src.embedding_service import EmbeddingService
+from src.retrieval_service import RetrievalService
+from src.vector_store import VectorStore
+
+
+class TestRetrievalService(unittest.TestCase):
+    """Test single and batched retrieval over a flat vector store"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, "embeddings.db")
+        self.embedding_service = EmbeddingService(cache_path=self.cache_path)
+        self.vector_store = VectorStore(
+            embedding_dim=self.embedding_service.get_embedding_dimension(),
+            persist_dir=os.path.join(self.temp_dir, "store"),
+            index_type="flat"
+        )
+        self.service = RetrievalService(self.vector_store, self.embedding_service)
+        self.service.set_similarity_threshold(0.0)
+
+        texts = [
+            "Quantum computing uses qubits for computation.",
+            "Classical computing uses bits for data storage.",
+            "The weather is sunny today."
+        ]
+        chunks = [
+            {'text': text, 'metadata': {'filename': 'doc.txt', 'chunk_id': i}}
+            for i, text in enumerate(texts)
+        ]
+        self.vector_store.add_documents(chunks, self.embedding_service.embed_chunks(texts), "doc")
+
+    def tearDown(self):
+        self.vector_store.flush()
+        shutil.rmtree(self.temp_dir)
+
+    def test_batch_matches_single_retrieval(self):
+        """Test that retrieve_batch returns what retrieve returns per query"""
+        queries = ["qubits computation", "data storage bits", "sunny weather"]
+
+        batch = self.service.retrieve_batch(queries, top_k=2)
+        self.assertEqual(len(batch), len(queries))
+
+        for query, results in zip(queries, batch):
+            single = self.service.retrieve(query, top_k=2)
+            self.assertEqual(
+                [r['metadata']['chunk_id'] for r in results],
+                [r['metadata']['chunk_id'] for r in single]
+            )
+        self.assertEqual(batch[0][0]['metadata']['chunk_id'], 0)
+
+    def test_batch_queries_are_not_persisted(self):
+        """Test that batched queries stay out of the persistent chunk cache"""
+        queries = ["qubits computation", "sunny weather"]
+        self.service.retrieve_batch(queries, top_k=1)
+
+        reloaded = EmbeddingCache(self.embedding_service.model_id, self.cache_path)
+        self.assertEqual(reloaded.get_many([EmbeddingCache.key(q) for q in queries]), {})
+
+    def test_empty_query_rejected(self):
+        """Test that an empty query in a batch is rejected"""
+        with self.assertRaises(ValueError):
+            self.service.retrieve_batch(["qubits", "  "])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 Test Script for RAG Question Answering System
 Run this after starting the server to validate functionality
 """
+import asyncio
 import requests
 import time
 import json
@@ -191,14 +192,22 @@ def test_rate_limiting():
     success_count = 0
     rate_limited_count = 0
     
-    for i in range(12):
-        response = requests.post(
-            f"{BASE_URL}/query",
-            json={"question": f"Test query {i}"},
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code == 200:
+    # Sent concurrently, so the server sees one burst
+    async def send_burst():
+        return await asyncio.gather(*(
+            asyncio.to_thread(
+                requests.post,
+                f"{BASE_URL}/query",
+                json={"question": f"Test query {i}"},
+                headers={"Content-Type": "application/json"}
+            )
+            for i in range(12)
+        ), return_exceptions=True)
+    
+    for i, response in enumerate(asyncio.run(send_burst())):
+        if isinstance(response, Exception):
+            print(f"   ❌ Request {i+1} failed: {response}")
+        elif response.status_code == 200:
             success_count += 1
         elif response.status_code == 429:
             rate_limited_count += 1
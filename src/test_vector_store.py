@@ -0,0 +1,150 @@
+"""
+Unit tests for the FAISS vector store
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import faiss
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.vector_store import VectorStore
+
+
+def _unit_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestVectorStore(unittest.TestCase):
+    """Test index migration, deletes, persistence and the search cache"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.flush()
+        shutil.rmtree(self.temp_dir)
+
+    def _store(self, dim: int, index_type: str, **overrides) -> VectorStore:
+        store = VectorStore(embedding_dim=dim, persist_dir=self.temp_dir, index_type=index_type)
+        for name, value in overrides.items():
+            setattr(store, name, value)
+        self.stores.append(store)
+        return store
+
+    @staticmethod
+    def _add(store: VectorStore, vectors: np.ndarray, per_document: int, first: int = 0):
+        """Add vectors as documents of per_document chunks, chunk i tagged with i"""
+        for start in range(0, len(vectors), per_document):
+            ids = range(first + start, first + min(start + per_document, len(vectors)))
+            chunks = [{'text': f"chunk {i}", 'metadata': {'filename': 'doc.txt', 'i': i}} for i in ids]
+            store.add_documents(chunks, vectors[start:start + per_document].copy(), f"doc{first + start}")
+
+    @staticmethod
+    def _top(store: VectorStore, vector: np.ndarray, top_k: int = 1):
+        return [r['metadata']['i'] for r in store.search(vector, top_k=top_k)]
+
+    def test_sq8_migration_and_delete(self):
+        """Test that sq8 stores move to scalar-quantized codes and delete in place"""
+        vectors = _unit_vectors(300, 32)
+        store = self._store(32, "sq8", SQ_TRAIN_SIZE=200)
+        self._add(store, vectors, per_document=100)
+
+        self.assertIsInstance(store._base_index(), faiss.IndexScalarQuantizer)
+        self.assertEqual(self._top(store, vectors[5]), [5])
+
+        self.assertTrue(store.delete_document("doc0"))
+        self.assertEqual(store.index.ntotal, 200)
+        self.assertTrue(all(i >= 100 for i in self._top(store, vectors[5], top_k=5)))
+
+    def test_ivfpq_migration_and_delete(self):
+        """Test that ivfpq stores move to product codes past the threshold"""
+        vectors = _unit_vectors(2000, 96)
+        store = self._store(96, "ivfpq", IVFPQ_MIN_VECTORS=2000)
+        self._add(store, vectors[:1500], per_document=500)
+        self.assertIsInstance(store._base_index(), faiss.IndexFlat)
+
+        self._add(store, vectors[1500:], per_document=500, first=1500)
+        base = store._base_index()
+        self.assertIsInstance(base, faiss.IndexIVFPQ)
+        self.assertEqual(base.nprobe, max(store.IVF_MIN_NPROBE, base.nlist // 50))
+        self.assertEqual(self._top(store, vectors[1234]), [1234])
+
+        self.assertTrue(store.delete_document("doc1000"))
+        self.assertEqual(store.index.ntotal, 1500)
+        self.assertTrue(all(not 1000 <= i < 1500 for i in self._top(store, vectors[1234], top_k=5)))
+
+    def test_hnsw_delete_rebuilds(self):
+        """Test that deleting from an HNSW store keeps the remaining chunks"""
+        vectors = _unit_vectors(300, 32)
+        store = self._store(32, "hnsw", HNSW_MIN_VECTORS=200)
+        self._add(store, vectors, per_document=100)
+        self.assertIsInstance(store._base_index(), faiss.IndexHNSW)
+
+        store.delete_document("doc100")
+        self.assertEqual(store.index.ntotal, 200)
+        self.assertEqual(self._top(store, vectors[250]), [250])
+
+    def test_reload_then_add(self):
+        """Test that a reloaded (memory-mapped) store serves searches and takes adds"""
+        vectors = _unit_vectors(60, 32)
+        store = self._store(32, "flat")
+        self._add(store, vectors[:40], per_document=20)
+        store.flush()
+
+        reloaded = self._store(32, "flat")
+        self.assertEqual(reloaded.get_stats()['chunks'], 40)
+        self.assertEqual(self._top(reloaded, vectors[7]), [7])
+
+        self._add(reloaded, vectors[40:], per_document=20, first=40)
+        self.assertEqual(reloaded.index.ntotal, 60)
+        self.assertEqual(self._top(reloaded, vectors[55]), [55])
+
+    def test_search_cache_invalidated_by_add(self):
+        """Test that a cached result is not served after new chunks are added"""
+        vectors = _unit_vectors(21, 32)
+        store = self._store(32, "flat")
+        self._add(store, vectors[:20], per_document=20)
+
+        self.assertNotEqual(self._top(store, vectors[20]), [20])
+        self._add(store, vectors[20:], per_document=1, first=20)
+        self.assertEqual(self._top(store, vectors[20]), [20])
+
+    def test_search_during_adds(self):
+        """Test that searches running alongside adds neither fail nor see partial state"""
+        vectors = _unit_vectors(400, 32)
+        store = self._store(32, "flat")
+        self._add(store, vectors[:20], per_document=20)
+        errors = []
+
+        def search():
+            try:
+                for i in range(200):
+                    results = store.search(vectors[i % 20], top_k=3)
+                    if results[0]['metadata']['i'] != i % 20:
+                        errors.append(f"query {i % 20} returned {results[0]['metadata']['i']}")
+            except Exception as e:
+                errors.append(repr(e))
+
+        searchers = [threading.Thread(target=search) for _ in range(4)]
+        for thread in searchers:
+            thread.start()
+        self._add(store, vectors[20:], per_document=20, first=20)
+        for thread in searchers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(store.index.ntotal, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,317 @@
+"""
+Vector Backends Module
+Dense vector storage for the hybrid retriever: ChromaDB or FAISS
+"""
+from typing import Dict, List, Optional, Tuple
+import atexit
+import numpy as np
+import os
+import pickle
+import threading
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class ChromaBackend:
+    """
+    ChromaDB collection with cosine HNSW space
+
+    The persistent client keeps vectors and documents on disk, so every API
+    worker opens the same store instead of building a private in-memory copy.
+    """
+
+    name = 'chromadb'
+
+    def __init__(self, persist_directory: str, collection_name: str = "documents"):
+        import chromadb
+        from chromadb.config import Settings
+
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict]
+    ):
+        self.collection.add(
+            ids=ids,
+            embeddings=embeddings.tolist(),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def query(
+        self, embedding: np.ndarray, n_results: int
+    ) -> Tuple[List[str], np.ndarray, List[str], List[Dict]]:
+        """Nearest chunks as (ids, cosine similarities, documents, metadatas)"""
+        return self.query_batch(np.asarray(embedding).reshape(1, -1), n_results)[0]
+
+    def query_batch(
+        self, embeddings: np.ndarray, n_results: int
+    ) -> List[Tuple[List[str], np.ndarray, List[str], List[Dict]]]:
+        """query() for each row of embeddings, in one collection.query call"""
+        results = self.collection.query(
+            query_embeddings=embeddings.tolist(),
+            n_results=n_results,
+            include=['documents', 'metadatas', 'distances']
+        )
+        # Chroma reports cosine distance
+        return [
+            (ids, 1 - np.asarray(distances, dtype=np.float64), documents, metadatas)
+            for ids, distances, documents, metadatas in zip(
+                results['ids'], results['distances'],
+                results['documents'], results['metadatas']
+            )
+        ]
+
+    def get(self, ids: List[str]) -> Tuple[List[str], List[str], List[Dict]]:
+        """Stored (ids, documents, metadatas) of the ids that exist"""
+        results = self.collection.get(ids=ids, include=['documents', 'metadatas'])
+        return results['ids'], results['documents'], results['metadatas']
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def flush(self):
+        """Chroma persists every add itself"""
+
+    def info(self) -> Dict:
+        return {
+            'backend': self.name,
+            'index_type': 'hnsw',
+            'space': (self.collection.metadata or {}).get('hnsw:space', 'l2'),
+            'ntotal': self.count()
+        }
+
+
+class FaissBackend:
+    """
+    FAISS index over unit-length embeddings (inner product = cosine)
+
+    index_type="hnsw" builds an IndexHNSWFlat graph. index_type="ivfpq" is
+    meant for corpora past ~1M vectors: vectors go to an exact flat index
+    until there are enough to train the coarse quantizer and product codes,
+    then everything moves into an IndexIVFPQ. Position i in the index is
+    chunk ids[i]; documents and metadata are kept alongside and persisted
+    with faiss.write_index plus a pickle by flush(), like VectorStore.
+    """
+
+    name = 'faiss'
+    INDEX_TYPES = ("hnsw", "ivfpq")
+
+    # HNSW graph parameters
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 200
+    HNSW_EF_SEARCH = 64
+
+    # IVF-PQ parameters: FAISS wants ~39 training points per list
+    IVF_NLIST = 4096
+    IVF_NPROBE = 32
+    PQ_M = 64
+    PQ_NBITS = 8
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_dim: int = 384,
+        index_type: str = "hnsw"
+    ):
+        if faiss is None:
+            raise ImportError("FAISS library required. Install with: pip install faiss-cpu")
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {self.INDEX_TYPES}")
+
+        self.persist_directory = persist_directory
+        self.embedding_dim = embedding_dim
+        self.index_type = index_type
+        self.index_path = os.path.join(persist_directory, "faiss_index.bin")
+        self.metadata_path = os.path.join(persist_directory, "faiss_metadata.pkl")
+        self._lock = threading.Lock()
+        self._dirty = False  # Added chunks not yet written by flush()
+
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._positions: Dict[str, int] = {}  # chunk_id -> position
+
+        os.makedirs(persist_directory, exist_ok=True)
+        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
+            self._load()
+        else:
+            self.index = self._new_index()
+        atexit.register(self.flush)
+
+    def _new_index(self):
+        if self.index_type == "ivfpq":
+            # Exact search until the IVF-PQ index can be trained
+            return faiss.IndexFlatIP(self.embedding_dim)
+
+        index = faiss.IndexHNSWFlat(self.embedding_dim, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = self.HNSW_EF_SEARCH
+        return index
+
+    @property
+    def _train_size(self) -> int:
+        return max(self.IVF_NLIST * 39, 2 ** self.PQ_NBITS)
+
+    def _maybe_train_ivfpq(self):
+        """Move the flat staging index into a trained IndexIVFPQ once it is large enough"""
+        if self.index_type != "ivfpq" or not isinstance(self.index, faiss.IndexFlat):
+            return
+        if self.index.ntotal < self._train_size:
+            return
+
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        quantizer = faiss.IndexFlatIP(self.embedding_dim)
+        index = faiss.IndexIVFPQ(
+            quantizer, self.embedding_dim, self.IVF_NLIST, self.PQ_M, self.PQ_NBITS,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+        index.add(vectors)
+        index.nprobe = self.IVF_NPROBE
+        self.index = index
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict]
+    ):
+        with self._lock:
+            # Like Chroma, ids that are already stored are skipped
+            new = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._positions]
+            if not new:
+                return
+
+            self.index.add(np.ascontiguousarray(embeddings[new], dtype=np.float32))
+            for i in new:
+                self._positions[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+                self.documents.append(documents[i])
+                self.metadatas.append(metadatas[i])
+
+            self._maybe_train_ivfpq()
+            self._dirty = True
+
+    def query(
+        self, embedding: np.ndarray, n_results: int
+    ) -> Tuple[List[str], np.ndarray, List[str], List[Dict]]:
+        """Nearest chunks as (ids, cosine similarities, documents, metadatas)"""
+        return self.query_batch(np.asarray(embedding).reshape(1, -1), n_results)[0]
+
+    def query_batch(
+        self, embeddings: np.ndarray, n_results: int
+    ) -> List[Tuple[List[str], np.ndarray, List[str], List[Dict]]]:
+        """query() for each row of embeddings, in one index.search call"""
+        with self._lock:
+            k = min(n_results, self.index.ntotal)
+            if k == 0:
+                return [([], np.empty(0, dtype=np.float64), [], []) for _ in embeddings]
+
+            scores, positions = self.index.search(
+                np.ascontiguousarray(embeddings, dtype=np.float32), k
+            )
+
+        results = []
+        for row_scores, row_positions in zip(scores, positions):
+            found = row_positions >= 0  # Approximate indexes may return fewer than k
+            row = row_positions[found].tolist()
+            results.append((
+                [self.ids[p] for p in row],
+                row_scores[found].astype(np.float64),
+                [self.documents[p] for p in row],
+                [self.metadatas[p] for p in row]
+            ))
+        return results
+
+    def get(self, ids: List[str]) -> Tuple[List[str], List[str], List[Dict]]:
+        """Stored (ids, documents, metadatas) of the ids that exist"""
+        positions = [self._positions[i] for i in ids if i in self._positions]
+        return (
+            [self.ids[p] for p in positions],
+            [self.documents[p] for p in positions],
+            [self.metadatas[p] for p in positions]
+        )
+
+    def count(self) -> int:
+        return self.index.ntotal
+
+    def info(self) -> Dict:
+        index_type = self.index_type
+        if index_type == "ivfpq" and isinstance(self.index, faiss.IndexFlat):
+            index_type = "flat (ivfpq untrained)"
+        return {
+            'backend': self.name,
+            'index_type': index_type,
+            'space': 'ip',
+            'ntotal': self.count()
+        }
+
+    def flush(self):
+        """Persist chunks added since the last flush"""
+        with self._lock:
+            if self._dirty:
+                self._persist()
+                self._dirty = False
+
+    def _persist(self):
+        faiss.write_index(self.index, self.index_path)
+        with open(self.metadata_path, 'wb') as f:
+            pickle.dump({
+                'index_type': self.index_type,
+                'ids': self.ids,
+                'documents': self.documents,
+                'metadatas': self.metadatas
+            }, f)
+
+    def _load(self):
+        self.index = faiss.read_index(self.index_path)
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = self.HNSW_EF_SEARCH
+        elif isinstance(self.index, faiss.IndexIVF):
+            self.index.nprobe = self.IVF_NPROBE
+
+        with open(self.metadata_path, 'rb') as f:
+            data = pickle.load(f)
+        self.index_type = data['index_type']
+        self.ids = data['ids']
+        self.documents = data['documents']
+        self.metadatas = data['metadatas']
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+
+
+def create_backend(
+    backend: str,
+    persist_directory: str,
+    embedding_dim: int = 384,
+    index_type: Optional[str] = None
+):
+    """
+    Build a vector backend by name
+
+    Args:
+        backend: "chroma" or "faiss"
+        persist_directory: Directory holding the store
+        embedding_dim: Embedding dimension (FAISS only)
+        index_type: "hnsw" or "ivfpq" (FAISS only, default hnsw)
+    """
+    if backend == "chroma":
+        return ChromaBackend(persist_directory)
+    if backend == "faiss":
+        return FaissBackend(persist_directory, embedding_dim, index_type or "hnsw")
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -3,51 +3,205 @@ Vector Store Module
 Manages document embeddings storage and similarity search using FAISS
 """
 import numpy as np
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import atexit
+import hashlib
 import logging
+import orjson
 import pickle
 import os
+import threading
+import time
+
+from .chunk_store import ChunkStore
+from .query_cache import QueryCache
+from .semantic_cache import SemanticQueryCache
 
 logger = logging.getLogger(__name__)
 
 
+class _ReadWriteLock:
+    """
+    Lock held by any number of readers or by one writer
+    
+    Waiting writers block new readers, so a steady stream of searches
+    cannot starve an ingest. The writer may re-acquire it.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
 class VectorStore:
     """
     FAISS-based vector store for efficient similarity search
     
-    Uses FAISS IndexFlatIP (Inner Product) for cosine similarity
-    since embeddings are normalized.
+    Uses inner product for cosine similarity since embeddings are
+    normalized. The default index_type="hnsw" searches an HNSW graph over
+    float16 vectors (approximate, O(log N) distance computations per
+    query, half the memory of float32 with negligible recall loss); below
+    HNSW_MIN_VECTORS vectors an exact IndexFlatIP is used, which is
+    cheaper at that size. index_type="flat" always searches exactly.
+    With index_type="sq8" vectors are stored as 8-bit scalar-quantized
+    codes instead, once SQ_TRAIN_SIZE vectors are available to train the
+    quantizer ranges (4x less memory and bandwidth per scan, small loss in
+    score precision). index_type="ivfpq" is meant for corpora of millions
+    of chunks: past IVFPQ_MIN_VECTORS vectors they move into an IndexIVFPQ
+    storing PQ_M-byte product codes (32x smaller than float32 at d=384),
+    scored against per-query distance lookup tables within the nprobe
+    closest inverted lists.
     """
     
-    def __init__(self, embedding_dim: int = 384, persist_dir: str = "./data"):
+    INDEX_TYPES = ("flat", "sq8", "hnsw", "ivfpq")
+    
+    # HNSW graph parameters
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 200
+    HNSW_EF_SEARCH = 64
+    HNSW_MIN_VECTORS = 10_000
+    
+    # Vectors the 8-bit scalar quantizer is trained on
+    SQ_TRAIN_SIZE = 10_000
+    
+    # IVF-PQ parameters: nlist = 4 * sqrt(N) inverted lists at migration,
+    # trained on up to IVF_TRAIN_PER_LIST sampled vectors per list
+    IVFPQ_MIN_VECTORS = 100_000
+    IVF_TRAIN_PER_LIST = 64
+    IVF_MIN_NPROBE = 8
+    PQ_M = 48
+    PQ_NBITS = 8
+    
+    # add_documents persists once this many chunks are unsaved or the last
+    # save is this old; flush() persists right away
+    PERSIST_EVERY_CHUNKS = 10_000
+    PERSIST_INTERVAL_SECONDS = 10.0
+    
+    # FAISS OpenMP threads, half the cores so concurrent requests do not
+    # oversubscribe them, and the query count from which distances are
+    # computed with a BLAS matrix product instead of per-query loops
+    OMP_THREADS = max(1, (os.cpu_count() or 1) // 2)
+    BLAS_THRESHOLD = 16
+    
+    # Results of recent searches, keyed by query vector and parameters
+    SEARCH_CACHE_SIZE = 512
+    
+    # Queries at least this similar to a recent one reuse its results
+    SEMANTIC_CACHE_THRESHOLD = 0.97
+    SEMANTIC_CACHE_SIZE = 1024
+    
+    def __init__(
+        self,
+        embedding_dim: int = 384,
+        persist_dir: str = "./data",
+        index_type: str = "hnsw"
+    ):
         """
         Initialize vector store
         
         Args:
             embedding_dim: Dimension of embeddings
             persist_dir: Directory to persist index and metadata
+            index_type: "hnsw" for graph search, "flat" for exact float32
+                search, "sq8" for int8 codes, "ivfpq" for product codes
         """
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {self.INDEX_TYPES}")
+        if index_type == "ivfpq" and embedding_dim % self.PQ_M:
+            raise ValueError(f"embedding_dim must be a multiple of PQ_M={self.PQ_M} for ivfpq")
+        
         self.embedding_dim = embedding_dim
         self.persist_dir = persist_dir
+        self.index_type = index_type
         self.index = None
-        self.chunks = []  # Store chunk metadata
-        self.document_map = {}  # Map document_id to chunk indices
+        self._index_mmapped = False  # Read-only until _make_index_writable()
+        self.chunks = ChunkStore(persist_dir)  # Chunk text and metadata by chunk id
+        self.document_map = {}  # Map document_id to chunk ids
+        self._next_id = 0
+        self._unpersisted_chunks = 0
+        self._dirty = False
+        self._last_persist = time.monotonic()
+        
+        # Searches share the index; adds, deletes and flushes take it alone
+        self._lock = _ReadWriteLock()
+        
+        # Cleared whenever chunks are added or deleted; the generation keeps
+        # a search that raced with the change from caching its stale result
+        self.search_cache = QueryCache(max_size=self.SEARCH_CACHE_SIZE)
+        self.semantic_cache = SemanticQueryCache(
+            threshold=self.SEMANTIC_CACHE_THRESHOLD,
+            max_size=self.SEMANTIC_CACHE_SIZE
+        )
+        self._search_generation = 0
+        self._search_cache_hits = 0
+        self._search_cache_misses = 0
+        
+        # Per-thread float32 query buffers reused across searches
+        self._query_scratch = threading.local()
         
         # Create persist directory
         os.makedirs(persist_dir, exist_ok=True)
         
+        # Process-wide settings
+        import faiss
+        faiss.omp_set_num_threads(self.OMP_THREADS)
+        faiss.cvar.distance_compute_blas_threshold = self.BLAS_THRESHOLD
+        
         self._initialize_index()
         self._load_persisted_data()
+        atexit.register(self.flush)
         
-        logger.info(f"VectorStore initialized with dimension {embedding_dim}")
+        logger.info(f"VectorStore initialized with dimension {embedding_dim}, index_type={index_type}")
     
     def _initialize_index(self):
         """Initialize FAISS index"""
         try:
             import faiss
             
-            # Use IndexFlatIP for inner product (cosine similarity with normalized vectors)
-            self.index = faiss.IndexFlatIP(self.embedding_dim)
+            # Use IndexFlatIP for inner product (cosine similarity with normalized vectors).
+            # hnsw and sq8 stores also start here; _maybe_upgrade_index moves them
+            # to their own index once enough vectors are added. The IndexIDMap2
+            # addresses vectors by chunk id, so deletes can remove them in place
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedding_dim))
+            self._index_mmapped = False
             logger.info("FAISS index initialized with IndexFlatIP")
             
         except ImportError:
@@ -63,84 +217,297 @@ class VectorStore:
         
         Args:
             chunks: List of chunk dictionaries with text and metadata
-            embeddings: NumPy array of embeddings
+            embeddings: NumPy array of embeddings; a writable float32 array
+                is L2-normalized in place
             document_id: Unique document identifier
         """
-        if len(chunks) != len(embeddings):
-            raise ValueError("Number of chunks must match number of embeddings")
+        self.add_documents_stream([(chunks, embeddings)], document_id)
+    
+    def add_documents_stream(
+        self,
+        batches: Iterable[Tuple[List[Dict], np.ndarray]],
+        document_id: str
+    ) -> int:
+        """
+        Add a document from an iterable of (chunks, embeddings) batches
         
-        try:
-            # Get starting index for new chunks
-            start_idx = len(self.chunks)
-            
-            # Add to index
-            self.index.add(embeddings.astype('float32'))
-            
-            # Store chunk metadata
-            self.chunks.extend(chunks)
+        Each batch is indexed before the next one is pulled, and chunk texts
+        are flushed to disk every PERSIST_EVERY_CHUNKS chunks, so memory is
+        bounded by the batch size rather than the document size.
+        
+        Args:
+            batches: Iterable of (chunk dictionaries, embeddings) pairs, as
+                taken by add_documents
+            document_id: Unique document identifier
             
-            # Update document map
-            chunk_indices = list(range(start_idx, start_idx + len(chunks)))
-            if document_id in self.document_map:
-                self.document_map[document_id].extend(chunk_indices)
-            else:
-                self.document_map[document_id] = chunk_indices
+        Returns:
+            Number of chunks added
+        """
+        total = 0
+        try:
+            import faiss
             
-            logger.info(f"Added {len(chunks)} chunks for document {document_id}. Total chunks: {len(self.chunks)}")
+            for chunks, embeddings in batches:
+                if len(chunks) != len(embeddings):
+                    raise ValueError("Number of chunks must match number of embeddings")
+                if not len(chunks):
+                    continue
+                
+                with self._lock.write():
+                    self._make_index_writable()
+                    
+                    # Ids are never reused, so they stay valid across deletes
+                    chunk_ids = np.arange(self._next_id, self._next_id + len(chunks), dtype=np.int64)
+                    self._next_id += len(chunks)
+                    
+                    # Inner product is only cosine similarity on unit vectors
+                    embeddings = np.require(embeddings, dtype=np.float32, requirements=['C', 'W'])
+                    faiss.normalize_L2(embeddings)
+                    
+                    # Add to index
+                    self.index.add_with_ids(embeddings, chunk_ids)
+                    self._maybe_upgrade_index()
+                    
+                    # Store chunk metadata
+                    chunk_ids = chunk_ids.tolist()
+                    self.chunks.add(chunk_ids, chunks)
+                    self._invalidate_search_cache()
+                    
+                    # Update document map
+                    self.document_map.setdefault(document_id, []).extend(chunk_ids)
+                    total += len(chunks)
+                    
+                    # Persist to disk, coalescing the rewrites of bulk ingests
+                    self._dirty = True
+                    self._unpersisted_chunks += len(chunks)
+                    if (self._unpersisted_chunks >= self.PERSIST_EVERY_CHUNKS
+                            or time.monotonic() - self._last_persist >= self.PERSIST_INTERVAL_SECONDS):
+                        self.flush()
             
-            # Persist to disk
-            self._persist_data()
+            logger.info(f"Added {total} chunks for document {document_id}. Total chunks: {len(self.chunks)}")
+            return total
             
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}")
             raise
     
-    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
+    def _base_index(self):
+        """The index wrapped by the id map"""
+        import faiss
+        return faiss.downcast_index(self.index.index)
+    
+    def _stored_vectors(self):
+        """All indexed vectors and their chunk ids, in index order"""
+        import faiss
+        base = self._base_index()
+        return base.reconstruct_n(0, base.ntotal), faiss.vector_to_array(self.index.id_map)
+    
+    def _rebuild_index(self, vectors: np.ndarray, chunk_ids: np.ndarray):
+        """Replace the index with one holding vectors under chunk_ids"""
+        self._initialize_index()
+        if len(chunk_ids):
+            self.index.add_with_ids(vectors, chunk_ids)
+            self._maybe_upgrade_index()
+    
+    def _maybe_upgrade_index(self):
+        """Move the exact staging index into the configured index once it is large enough"""
+        import faiss
+        
+        if self.index_type == "flat" or not isinstance(self._base_index(), faiss.IndexFlat):
+            return
+        min_vectors = {
+            "sq8": self.SQ_TRAIN_SIZE,
+            "hnsw": self.HNSW_MIN_VECTORS,
+            "ivfpq": self.IVFPQ_MIN_VECTORS
+        }[self.index_type]
+        if self.index.ntotal < min_vectors:
+            return
+        
+        vectors, chunk_ids = self._stored_vectors()
+        if self.index_type == "sq8":
+            index = faiss.IndexScalarQuantizer(
+                self.embedding_dim,
+                faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            # Per-dimension ranges of real embeddings are far narrower than
+            # the [-1, 1] a unit vector allows, so training on them spends
+            # the 256 levels where the values actually are
+            index.train(vectors[:self.SQ_TRAIN_SIZE])
+        elif self.index_type == "ivfpq":
+            nlist = int(4 * np.sqrt(len(vectors)))
+            index = faiss.IndexIVFPQ(
+                faiss.IndexFlatIP(self.embedding_dim),
+                self.embedding_dim,
+                nlist,
+                self.PQ_M,
+                self.PQ_NBITS,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            # A random sample, so early documents do not shape all centroids
+            sample_size = min(len(vectors), nlist * self.IVF_TRAIN_PER_LIST)
+            sample = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+            index.train(vectors[np.sort(sample)])
+            index.nprobe = self._ivf_nprobe(nlist)
+        else:
+            index = faiss.IndexHNSWSQ(
+                self.embedding_dim,
+                faiss.ScalarQuantizer.QT_fp16,
+                self.HNSW_M,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = self.HNSW_EF_SEARCH
+            index.train(vectors)  # fp16 needs no ranges, but marks the index trained
+        self.index = faiss.IndexIDMap2(index)
+        self.index.add_with_ids(vectors, chunk_ids)
+        logger.info(f"Rebuilt index as {type(index).__name__} with {index.ntotal} vectors")
+    
+    def _ivf_nprobe(self, nlist: int) -> int:
+        """Inverted lists scanned per query"""
+        return max(self.IVF_MIN_NPROBE, nlist // 50)
+    
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        ef_search: Optional[int] = None
+    ) -> List[Dict]:
         """
         Search for similar chunks using query embedding
         
         Args:
             query_embedding: Query embedding vector
             top_k: Number of top results to return
+            ef_search: HNSW candidate list size for this query (default
+                HNSW_EF_SEARCH); higher is more accurate but slower
         
         Returns:
-            List of dictionaries containing chunk data and similarity scores
+            List of dictionaries containing chunk data and similarity scores.
+            Repeated searches share the cached list, which must not be modified
+        """
+        return self.search_batch(query_embedding.reshape(1, -1), top_k, ef_search)[0]
+    
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        ef_search: Optional[int] = None
+    ) -> List[List[Dict]]:
         """
+        search() for each row of query_embeddings
+        
+        Queries missing from the caches are searched together with a single
+        index.search call over an (nq, d) matrix.
+        
+        Returns:
+            One result list per query, in order
+        """
+        with self._lock.read():
+            return self._search_batch(query_embeddings, top_k, ef_search)
+    
+    def _search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        ef_search: Optional[int]
+    ) -> List[List[Dict]]:
         if self.index.ntotal == 0:
             logger.warning("Index is empty, no results to return")
-            return []
+            return [[] for _ in query_embeddings]
         
         try:
-            # Ensure query embedding is 2D
-            if query_embedding.ndim == 1:
-                query_embedding = query_embedding.reshape(1, -1)
+            import faiss
             
-            # Search
-            scores, indices = self.index.search(query_embedding.astype('float32'), min(top_k, self.index.ntotal))
+            # Copied, since query vectors often come from the embedding cache;
+            # normalized in place in a reused per-thread buffer
+            query_embeddings = np.asarray(query_embeddings).reshape(-1, self.embedding_dim)
+            buffer = self._query_buffer(len(query_embeddings))
+            np.copyto(buffer, query_embeddings)
+            query_embeddings = buffer
+            faiss.normalize_L2(query_embeddings)
+            params_key = repr((top_k, ef_search)).encode()
+            generation = self._search_generation
             
-            # Prepare results
             results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.chunks) and idx >= 0:
-                    result = {
-                        'text': self.chunks[idx]['text'],
-                        'metadata': self.chunks[idx]['metadata'],
-                        'score': float(score)  # Cosine similarity score
+            cache_keys = []
+            for query_embedding in query_embeddings:
+                cache_key = hashlib.blake2b(
+                    query_embedding.tobytes() + params_key, digest_size=16
+                ).digest()
+                cached = self.search_cache.get(cache_key)
+                if cached is None:
+                    # Near-duplicate questions embed close to an earlier query
+                    cached = self.semantic_cache.get(query_embedding, (top_k, ef_search))
+                results.append(cached)
+                cache_keys.append(cache_key)
+            
+            missing = [i for i, cached in enumerate(results) if cached is None]
+            self._search_cache_hits += len(results) - len(missing)
+            self._search_cache_misses += len(missing)
+            if not missing:
+                return results
+            
+            # Search
+            params = None
+            if ef_search is not None:
+                if isinstance(self._base_index(), faiss.IndexHNSW):
+                    params = faiss.SearchParametersHNSW(efSearch=ef_search)
+            queries = query_embeddings
+            if len(missing) < len(query_embeddings):
+                queries = query_embeddings[missing]
+            scores, indices = self.index.search(
+                queries, min(top_k, self.index.ntotal), params=params
+            )
+            
+            # Prepare results; -1 pads missing results. Chunks of all queries
+            # are fetched together, then split back per query
+            found = indices >= 0
+            chunks = self.chunks.get_many(indices[found])
+            found_scores = scores[found].tolist()
+            bounds = np.concatenate([[0], np.cumsum(found.sum(axis=1))]).tolist()
+            for row, i in enumerate(missing):
+                start, end = bounds[row], bounds[row + 1]
+                results[i] = [
+                    {
+                        'text': chunk['text'],
+                        'metadata': chunk['metadata'],
+                        'score': score  # Cosine similarity score
                     }
-                    results.append(result)
+                    for chunk, score in zip(chunks[start:end], found_scores[start:end])
+                    if chunk is not None
+                ]
+                
+                if generation == self._search_generation:
+                    self.search_cache.put(cache_keys[i], results[i])
+                    self.semantic_cache.put(query_embeddings[i], (top_k, ef_search), results[i])
             
-            logger.info(f"Retrieved {len(results)} chunks with scores: {[r['score'] for r in results]}")
             return results
             
         except Exception as e:
             logger.error(f"Error searching: {str(e)}")
             raise
     
+    def _query_buffer(self, n: int) -> np.ndarray:
+        """A C-contiguous float32 (n, embedding_dim) scratch buffer of this thread"""
+        buffer = getattr(self._query_scratch, 'buffer', None)
+        if buffer is None or len(buffer) < n:
+            buffer = np.empty((max(n, 1), self.embedding_dim), dtype=np.float32)
+            self._query_scratch.buffer = buffer
+        return buffer[:n]
+    
+    def _invalidate_search_cache(self):
+        self._search_generation += 1
+        self.search_cache.clear()
+        self.semantic_cache.clear()
+    
     def delete_document(self, document_id: str) -> bool:
         """
         Delete a document and its chunks from the store
         
-        Note: FAISS doesn't support deletion, so we rebuild the index
+        Flat, scalar-quantized and IVF-PQ indexes drop the chunks' vectors
+        in place. HNSW graphs cannot remove nodes, so they are rebuilt from the
+        stored vectors of the remaining chunks
         
         Args:
             document_id: Document ID to delete
@@ -148,51 +515,34 @@ class VectorStore:
         Returns:
             True if document was deleted, False if not found
         """
+        with self._lock.write():
+            return self._delete_document(document_id)
+    
+    def _delete_document(self, document_id: str) -> bool:
         if document_id not in self.document_map:
             logger.warning(f"Document {document_id} not found")
             return False
         
         try:
-            # Get indices to remove
-            indices_to_remove = set(self.document_map[document_id])
-            
-            # Filter chunks and rebuild embeddings
-            new_chunks = []
-            new_embeddings = []
+            import faiss
             
-            for i, chunk in enumerate(self.chunks):
-                if i not in indices_to_remove:
-                    new_chunks.append(chunk)
+            chunk_ids = np.asarray(self.document_map.pop(document_id), dtype=np.int64)
+            self._make_index_writable()
             
-            # Rebuild index if we have chunks left
-            if new_chunks:
-                # Re-generate embeddings for remaining chunks
-                from .embedding_service import EmbeddingService
-                embedding_service = EmbeddingService()
-                texts = [chunk['text'] for chunk in new_chunks]
-                new_embeddings = embedding_service.embed_chunks(texts)
-                
-                # Reset index
-                self._initialize_index()
-                self.index.add(new_embeddings.astype('float32'))
-                self.chunks = new_chunks
-                
-                # Rebuild document map
-                self.document_map = {}
-                for idx, chunk in enumerate(self.chunks):
-                    doc_id = chunk['metadata']['document_id']
-                    if doc_id in self.document_map:
-                        self.document_map[doc_id].append(idx)
-                    else:
-                        self.document_map[doc_id] = [idx]
+            if isinstance(self._base_index(), faiss.IndexHNSW):
+                # Reuse the indexed vectors instead of re-embedding the texts
+                vectors, stored_ids = self._stored_vectors()
+                keep = ~np.isin(stored_ids, chunk_ids)
+                self._rebuild_index(vectors[keep], stored_ids[keep])
             else:
-                # No chunks left, reset everything
-                self._initialize_index()
-                self.chunks = []
-                self.document_map = {}
+                self.index.remove_ids(chunk_ids)
+            
+            self.chunks.remove(chunk_ids.tolist())
+            self._invalidate_search_cache()
             
             # Persist changes
-            self._persist_data()
+            self._dirty = True
+            self.flush()
             
             logger.info(f"Deleted document {document_id}")
             return True
@@ -206,43 +556,71 @@ class VectorStore:
         return {
             'chunks': len(self.chunks),
             'documents': len(self.document_map),
-            'embedding_dim': self.embedding_dim
+            'embedding_dim': self.embedding_dim,
+            'index_type': self.index_type,
+            'search_cache_hits': self._search_cache_hits,
+            'search_cache_misses': self._search_cache_misses
         }
     
     def list_documents(self) -> List[Dict]:
         """List all documents in the store"""
-        documents = []
-        for doc_id, chunk_indices in self.document_map.items():
-            if chunk_indices:
-                first_chunk = self.chunks[chunk_indices[0]]
-                documents.append({
-                    'document_id': doc_id,
-                    'filename': first_chunk['metadata']['filename'],
-                    'chunk_count': len(chunk_indices)
-                })
-        return documents
-    
-    def _persist_data(self):
-        """Persist index and metadata to disk"""
+        with self._lock.read():
+            documents = [
+                (doc_id, chunk_ids) for doc_id, chunk_ids in self.document_map.items() if chunk_ids
+            ]
+            # Filenames come from each document's first chunk, fetched in one batch
+            first_chunks = self.chunks.get_many(
+                np.array([chunk_ids[0] for _, chunk_ids in documents], dtype=np.int64)
+            )
+        return [
+            {
+                'document_id': doc_id,
+                'filename': first_chunk['metadata']['filename'],
+                'chunk_count': len(chunk_ids)
+            }
+            for (doc_id, chunk_ids), first_chunk in zip(documents, first_chunks)
+            if first_chunk is not None
+        ]
+    
+    def flush(self):
+        """Persist pending changes to disk"""
+        with self._lock.write():
+            if not self._dirty or not self._persist_data():
+                return
+            self._dirty = False
+            self._unpersisted_chunks = 0
+            self._last_persist = time.monotonic()
+    
+    def _persist_data(self) -> bool:
+        """Persist index and metadata to disk, returning whether it succeeded"""
         try:
             import faiss
             
-            # Save FAISS index
-            index_path = os.path.join(self.persist_dir, "faiss_index.bin")
-            faiss.write_index(self.index, index_path)
+            # Chunks first: ids the index returns before their chunk is
+            # written would be skipped by search
+            self.chunks.flush()
             
-            # Save metadata
-            metadata_path = os.path.join(self.persist_dir, "metadata.pkl")
-            with open(metadata_path, 'wb') as f:
-                pickle.dump({
-                    'chunks': self.chunks,
-                    'document_map': self.document_map
-                }, f)
+            # Save document map
+            document_map_path = os.path.join(self.persist_dir, "document_map.json")
+            with open(f"{document_map_path}.tmp", 'wb') as f:
+                f.write(orjson.dumps({
+                    'document_map': self.document_map,
+                    'next_id': self._next_id
+                }))
+            os.replace(f"{document_map_path}.tmp", document_map_path)
+            
+            # Save FAISS index; replaced rather than rewritten, since a
+            # memory-mapped index may still be reading the old file
+            index_path = os.path.join(self.persist_dir, "faiss_index.bin")
+            faiss.write_index(self.index, f"{index_path}.tmp")
+            os.replace(f"{index_path}.tmp", index_path)
             
             logger.info("Data persisted to disk")
+            return True
             
         except Exception as e:
             logger.error(f"Error persisting data: {str(e)}")
+            return False
     
     def _load_persisted_data(self):
         """Load persisted index and metadata from disk"""
@@ -250,21 +628,87 @@ class VectorStore:
             import faiss
             
             index_path = os.path.join(self.persist_dir, "faiss_index.bin")
-            metadata_path = os.path.join(self.persist_dir, "metadata.pkl")
+            document_map_path = os.path.join(self.persist_dir, "document_map.json")
+            legacy_metadata_path = os.path.join(self.persist_dir, "metadata.pkl")
             
-            if os.path.exists(index_path) and os.path.exists(metadata_path):
-                # Load FAISS index
-                self.index = faiss.read_index(index_path)
+            if os.path.exists(index_path) and os.path.exists(document_map_path):
+                # Load FAISS index memory-mapped, so start-up does not read
+                # it all; it is copied into memory on the first change
+                self.index = faiss.read_index(
+                    index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                )
+                self._index_mmapped = True
+                self._set_search_params()
                 
-                # Load metadata
-                with open(metadata_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.chunks = data['chunks']
-                    self.document_map = data['document_map']
+                # Load document map; chunk texts stay on disk until searched
+                with open(document_map_path, 'rb') as f:
+                    data = orjson.loads(f.read())
+                self.chunks.load()
+                self.document_map = data['document_map']
+                self._next_id = data['next_id']
                 
                 logger.info(f"Loaded persisted data: {len(self.chunks)} chunks, {len(self.document_map)} documents")
+            elif os.path.exists(index_path) and os.path.exists(legacy_metadata_path):
+                self._load_legacy_data(index_path, legacy_metadata_path)
             else:
                 logger.info("No persisted data found, starting fresh")
                 
         except Exception as e:
             logger.warning(f"Error loading persisted data: {str(e)}. Starting fresh.")
+            self._initialize_index()
+            self.chunks = ChunkStore(self.persist_dir)
+            self.document_map = {}
+            self._next_id = 0
+    
+    def _set_search_params(self):
+        """Apply the search-time parameters, which are not all persisted"""
+        import faiss
+        base = self._base_index()
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = self.HNSW_EF_SEARCH
+        elif isinstance(base, faiss.IndexIVF):
+            base.nprobe = self._ivf_nprobe(base.nlist)
+    
+    def _make_index_writable(self):
+        """Replace a memory-mapped index by an in-memory copy before it is modified"""
+        if not self._index_mmapped:
+            return
+        import faiss
+        
+        # The file is unchanged while the index is mapped: writes only
+        # follow a change, and every change comes through here first
+        self.index = faiss.read_index(os.path.join(self.persist_dir, "faiss_index.bin"))
+        self._index_mmapped = False
+        self._set_search_params()
+        logger.info("Loaded index into memory for writing")
+    
+    def _load_legacy_data(self, index_path: str, metadata_path: str):
+        """Load a store whose chunks were pickled, and rewrite it in the current format"""
+        import faiss
+        
+        index = faiss.read_index(index_path)
+        with open(metadata_path, 'rb') as f:
+            data = pickle.load(f)
+        
+        chunks = data['chunks']
+        if isinstance(index, faiss.IndexIDMap2):
+            self.index = index
+            base = self._base_index()
+            if isinstance(base, faiss.IndexHNSW):
+                base.hnsw.efSearch = self.HNSW_EF_SEARCH
+        else:
+            # Stores written before chunk ids: position i becomes id i
+            self._rebuild_index(
+                index.reconstruct_n(0, index.ntotal),
+                np.arange(index.ntotal, dtype=np.int64)
+            )
+            chunks = dict(enumerate(chunks))
+        
+        chunk_ids = sorted(chunks)
+        self.chunks.add(chunk_ids, [chunks[chunk_id] for chunk_id in chunk_ids])
+        self.document_map = data['document_map']
+        self._next_id = data.get('next_id', len(chunks))
+        
+        self._dirty = True
+        self.flush()
+        logger.info(f"Converted pickled store: {len(self.chunks)} chunks, {len(self.document_map)} documents")